@@ -0,0 +1,42 @@
+import sys
+import time
+import numpy as np
+from PIL import Image, ImageDraw
+from imageencode import encode_image
+
+# Format and level pairs to compare; None is the module default
+SETTINGS = [
+    ('png', 6), ('png', None), ('png', 0),
+    ('jpeg', None), ('jpeg', 75),
+    ('webp', None), ('webp', 60),
+    ('tiff', None),
+]
+
+# Usage: python bench_encode.py [image] [repeats]
+# Without an image, a noisy 4000x3000 photo-like test image with redaction
+# boxes is generated
+if len(sys.argv) > 1 and sys.argv[1] != '-':
+    image = Image.open(sys.argv[1])
+    image.load()
+else:
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:3000, 0:4000]
+    base = np.stack([x / 16 % 256, y / 12 % 256, (x + y) / 28 % 256], axis=-1)
+    pixels = np.clip(base + rng.normal(0, 12, base.shape), 0, 255).astype(np.uint8)
+    image = Image.fromarray(pixels, 'RGB')
+    draw = ImageDraw.Draw(image)
+    for i in range(40):
+        draw.rectangle([100 + i * 90, 200 + i * 60, 400 + i * 90, 240 + i * 60], fill=(255, 192, 203))
+repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+print(f"Encoding {image.width}x{image.height} {image.mode}, best of {repeats}")
+
+raw = image.width * image.height * len(image.getbands())
+for output_format, level in SETTINGS:
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        data, _ = encode_image(image, output_format, level)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    label = f"{output_format} {'default' if level is None else level}"
+    print(f"{label:>14}: {best:.3f}s, {len(data) / 1024:.0f} KiB ({len(data) / raw:.1%} of raw)")
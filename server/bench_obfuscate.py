@@ -0,0 +1,28 @@
+import random
+import sys
+import time
+import pandas as pd
+from obfuscation import obfuscate_series
+
+LATENCY = 0.2  # Seconds per request, roughly a local model's round trip
+
+def stand_in(prompt, rows):
+    # Answers out of order and sometimes drops a row, like a real model does
+    time.sleep(LATENCY)
+    ids = list(rows)
+    random.shuffle(ids)
+    if len(ids) > 1 and random.random() < 0.2:
+        ids.pop()
+    return {row_id: rows[row_id].upper() for row_id in ids}
+
+# Usage: python bench_obfuscate.py [rows]
+count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+series = pd.Series([f"{i}, Riverview" for i in range(count)], dtype=str)
+expected = series.str.upper()
+
+for concurrency in (1, 2, 4, 8, 16):
+    start = time.perf_counter()
+    result = obfuscate_series(series, "", batch_size=50, concurrency=concurrency, chat=stand_in)
+    elapsed = time.perf_counter() - start
+    assert result.equals(expected)
+    print(f"concurrency {concurrency:>2}: {elapsed:.2f}s, {count / elapsed:.0f} rows/s")
@@ -0,0 +1,92 @@
+from bisect import bisect_right
+from collections import defaultdict
+
+# A line counts as boilerplate once it appears on this many pages
+MIN_PAGES = 2
+# Shorter runs of repeated lines stay with their page, where they give the
+# surrounding text context and cost little to resend
+MIN_BLOCK_CHARS = 40
+
+def _lines(text):
+    lines = []
+    position = 0
+    for line in text.splitlines(keepends=True):
+        lines.append((position, line))
+        position += len(line)
+    return lines
+
+def split_boilerplate(pages):
+    """
+    Split page texts into detection units with repeated blocks sent once.
+
+    Lines are fingerprinted by their stripped text. A run of consecutive
+    lines that each appear on at least MIN_PAGES pages is a boilerplate
+    block; every distinct block becomes one unit shared by all the pages it
+    is on, and each page's remaining lines become that page's own unit.
+
+    Args:
+        pages (list): Page texts in page order
+
+    Returns:
+        list: Units, each with the 'text' to detect on and its 'places': one
+            (page number, fragments) per page it stands for, where fragments
+            are (offset in the unit text, offset in the page text, length)
+    """
+    line_pages = defaultdict(set)
+    page_lines = [_lines(text) for text in pages]
+    for page_num, lines in enumerate(page_lines):
+        for _, line in lines:
+            if line.strip():
+                line_pages[line.strip()].add(page_num)
+
+    def repeated(line):
+        return len(line_pages.get(line.strip(), ())) >= MIN_PAGES
+
+    units = []
+    blocks = {}
+    for page_num, lines in enumerate(page_lines):
+        own = []
+        fragments = []
+        length = 0
+        i = 0
+        while i < len(lines):
+            j = i
+            while j < len(lines) and (repeated(lines[j][1]) or (j > i and not lines[j][1].strip())):
+                j += 1
+            block = ''.join(line for _, line in lines[i:j])
+            if len(block.strip()) >= MIN_BLOCK_CHARS:
+                if block not in blocks:
+                    blocks[block] = len(units)
+                    units.append({'text': block, 'places': []})
+                units[blocks[block]]['places'].append((page_num, [(0, lines[i][0], len(block))]))
+                i = j
+                continue
+            for start, line in lines[i:max(j, i + 1)]:
+                if fragments and fragments[-1][0] + fragments[-1][2] == length and fragments[-1][1] + fragments[-1][2] == start:
+                    fragments[-1] = (fragments[-1][0], fragments[-1][1], fragments[-1][2] + len(line))
+                else:
+                    fragments.append((length, start, len(line)))
+                own.append(line)
+                length += len(line)
+            i = max(j, i + 1)
+        if ''.join(own).strip():
+            units.append({'text': ''.join(own), 'places': [(page_num, fragments)]})
+    return units
+
+def unit_to_pages(unit, start, end):
+    """
+    Map a span of a unit's text to the pages it stands for.
+
+    Returns:
+        list: (page number, start, end) in page text, one per page the span
+            is on; a span crossing a gap between fragments maps nowhere
+    """
+    found = []
+    for page_num, fragments in unit['places']:
+        index = bisect_right([fragment[0] for fragment in fragments], start) - 1
+        if index < 0:
+            continue
+        unit_start, page_start, length = fragments[index]
+        if end <= unit_start + length:
+            found.append((page_num, page_start + start - unit_start, page_start + end - unit_start))
+    return found
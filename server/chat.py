@@ -69,3 +69,80 @@ def chatlocal(system,content):
     response = json.loads(completion.choices[0].message.content)["changed_names"]
     comma_separated_string = ",".join(response)
     return comma_separated_string
+
+
+class Row(BaseModel):
+    id: str
+    value: str
+
+class RowsResponseFormat(BaseModel):
+    rows: list[Row]
+def chatrows(system, rows):
+    """
+    Obfuscate a batch of values keyed by row id.
+
+    Args:
+        system (str): The obfuscation instruction for the column
+        rows (dict): Row id (str) -> original value
+
+    Returns:
+        dict: Row id -> changed value, for the rows the model returned
+    """
+    system="You are a bot that ofuscates by changing the values by: "+system +"You are given a JSON object of row ids and values. Return every row id with its changed value in the original format and nothing else"
+    from openai import OpenAI
+    client = OpenAI(api_key="")
+
+    completion = client.beta.chat.completions.parse(
+        model="gpt-4o-mini",
+        messages=[
+            {
+                "role": "system",
+                "content": system
+            },
+            {
+                "role": "user",
+                "content": json.dumps(rows)
+            }
+        ],
+        response_format=RowsResponseFormat,
+    )
+    response = json.loads(completion.choices[0].message.content)["rows"]
+    return {row["id"]: row["value"] for row in response}
+
+
+class RuleGenerator(BaseModel):
+    group: str
+    generator: str
+
+class RuleResponseFormat(BaseModel):
+    pattern: str
+    template: str
+    generators: list[RuleGenerator]
+def chatrule(system, content):
+    """
+    Ask for a transformation rule instead of transformed values.
+
+    Returns:
+        dict: 'pattern' (regex with named groups), 'template' ({group}
+            placeholders) and 'generators' (group -> generator name)
+    """
+    from openai import OpenAI
+    client = OpenAI(api_key="")
+
+    completion = client.beta.chat.completions.parse(
+        model="gpt-4o-mini",
+        messages=[
+            {
+                "role": "system",
+                "content": system
+            },
+            {
+                "role": "user",
+                "content": content
+            }
+        ],
+        response_format=RuleResponseFormat,
+    )
+    response = json.loads(completion.choices[0].message.content)
+    response["generators"] = {item["group"]: item["generator"] for item in response["generators"]}
+    return response
@@ -0,0 +1,87 @@
+import csv
+import os
+
+PARQUET_BATCH_ROWS = 65536
+CSV_BLOCK_BYTES = 1 << 22
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.csv
+        import pyarrow.parquet
+    except ImportError:
+        raise Exception("The columnar path needs pyarrow: pip install pyarrow")
+    return pyarrow
+
+def is_parquet(path):
+    return os.path.splitext(path)[1].lower() in ('.parquet', '.pq')
+
+def _open_csv(pa, input_path):
+    with open(input_path, mode='r', newline='') as file:
+        names = next(csv.reader(file))
+    # Everything stays a string, so untouched columns are never converted:
+    # their Arrow buffers hold the field text and go straight to the writer
+    reader = pa.csv.open_csv(
+        input_path,
+        read_options=pa.csv.ReadOptions(block_size=CSV_BLOCK_BYTES),
+        parse_options=pa.csv.ParseOptions(newlines_in_values=True),
+        convert_options=pa.csv.ConvertOptions(column_types={name: pa.string() for name in names}),
+    )
+    return reader.schema, reader
+
+def _open_parquet(pa, input_path):
+    parquet = pa.parquet.ParquetFile(input_path)
+    return parquet.schema_arrow, parquet.iter_batches(batch_size=PARQUET_BATCH_ROWS)
+
+def _open_writer(pa, output_file, schema):
+    if is_parquet(output_file):
+        return pa.parquet.ParquetWriter(output_file, schema)
+    return pa.csv.CSVWriter(output_file, schema, write_options=pa.csv.WriteOptions(quoting_style='needed'))
+
+def convert_columnar(input_path, output_file, columns, transform):
+    """
+    Rewrite a CSV or Parquet file touching only the planned columns.
+
+    Record batches are read with pyarrow. Only the named columns are turned
+    into pandas and transformed; every other column keeps its Arrow buffers
+    and is written out as is. Input and output can each be CSV or Parquet,
+    picked by extension.
+
+    Args:
+        input_path (str): CSV or Parquet input
+        output_file (str): CSV or Parquet output
+        columns (list): Names of the columns the plan changes
+        transform (callable): transform(DataFrame of those columns) -> DataFrame
+
+    Returns:
+        int: Rows processed
+    """
+    pa = _pyarrow()
+    schema, batches = (_open_parquet if is_parquet(input_path) else _open_csv)(pa, input_path)
+    touched = [name for name in schema.names if name in set(columns)]
+    # Transformed columns come back as text whatever their input type was
+    for name in touched:
+        schema = schema.set(schema.get_field_index(name), pa.field(name, pa.string()))
+
+    rows = 0
+    writer = _open_writer(pa, output_file, schema)
+    try:
+        for batch in batches:
+            if touched:
+                # The plan sees text with nulls as empty strings; nulls are
+                # put back afterwards so they pass through as nulls
+                columns_text = {name: batch.column(name).cast(pa.string()) for name in touched}
+                nulls = {name: column.is_null().to_numpy(zero_copy_only=False) for name, column in columns_text.items()}
+                frame = pa.table(columns_text).to_pandas().fillna('')
+                changed = transform(frame)
+                arrays = [
+                    pa.array(changed[name].astype(str).to_numpy(), type=pa.string(), mask=nulls[name]) if name in touched else batch.column(name)
+                    for name in schema.names
+                ]
+                batch = pa.RecordBatch.from_arrays(arrays, schema=schema)
+            writer.write_batch(batch)
+            rows += batch.num_rows
+            print(f"Processed {rows} rows")
+    finally:
+        writer.close()
+    return rows
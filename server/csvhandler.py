@@ -1,9 +1,20 @@
-from chat import chatlocal
+from masking import mask_series, parse_mask_mode
+from obfuscation import obfuscate_series, BATCH_SIZE, CONCURRENCY
+from pseudonymize import pseudonymize_series
+from rules import rule_obfuscate_series
+from piiclassifier import classify_csv
+from columnar import convert_columnar, is_parquet
+from incremental import BoundedReader, load_checkpoint, save_checkpoint, record_end, update_hash, is_stable
+from parallel import run_sharded
 import csv
+import hashlib
+import io
 import pandas as pd
 import json
 import os
 
+INCREMENTAL_CHUNK_SIZE = 100000
+
 def predictheaders(file_path):
     try:
         with open(file_path, mode='r') as file:
@@ -14,7 +25,126 @@ def predictheaders(file_path):
     except Exception as e:
         raise Exception(f"Error reading CSV headers from {file_path}: {str(e)}")
 
+def suggestheaders(file_path):
+    """
+    Suggest a PII type, confidence and default plan entry for every header,
+    from a bounded random sample of rows taken from the first
+    piiclassifier.SAMPLE_BYTES of the file.
+    """
+    try:
+        return classify_csv(file_path)
+    except Exception as e:
+        raise Exception(f"Error classifying CSV columns in {file_path}: {str(e)}")
+
+def read_csv(source, **kwargs):
+    # Every cell is read as text so untouched columns are written back exactly
+    # as they came in, and chunked reads can't infer a different dtype per chunk.
+    return pd.read_csv(source, dtype=str, keep_default_na=False, na_filter=False, **kwargs)
+
+def apply_plan(df, column_info, batch_size=BATCH_SIZE, concurrency=CONCURRENCY, mappings=None, secret=None, rules=None):
+    """
+    Apply the per-column mask/obfuscate plan to a frame of rows.
+
+    A column's mode is 'obfuscate', 'mask' or 'mask:<policy>' where policy is
+    one of masking.MASK_POLICIES; 'keep' sets the characters 'keep_last' leaves.
+    Obfuscated columns go to the LLM unless their 'engine' is 'local', which
+    pseudonymizes them in process as their 'type' (pseudonymize.PSEUDONYM_KINDS),
+    or 'rule', which has the LLM turn the prompt into a rule run locally.
+
+    Args:
+        df (DataFrame): Rows to transform, read with read_csv
+        column_info (list): The 'headers' entries of the request
+        batch_size (int): Rows per obfuscation request
+        concurrency (int): Obfuscation requests in flight at once
+        mappings (dict): Column name -> obfuscation mapping (see
+            obfuscate_series), shared across calls so every chunk of a file
+            reuses the same replacements
+        secret (str): Key for the local engine and the mappings
+        rules (dict): Column name -> rule of the 'rule' engine, shared like
+            mappings; columns missing from it derive their rule once
+
+    Returns:
+        DataFrame: The transformed rows
+    """
+    if mappings is None:
+        mappings = {}
+    updated_df = df.copy()
+    og_headers = set(df.columns.tolist())
+
+    for col in column_info:
+        column_name = col['name']
+        mode = col['mode']
+        instruction = col.get('prompt', '')
+        policy = parse_mask_mode(mode)
+
+        if column_name in og_headers:
+            if policy:
+                print(f"Masking the data in column {column_name} with policy {policy}")
+                updated_df[column_name] = mask_series(df[column_name], policy, keep=col.get('keep', 4))
+                print(f"Data masked for {column_name}")
+            elif mode == "obfuscate" and col.get('engine') == 'local':
+                print(f"Pseudonymizing the data in column {column_name}")
+                updated_df[column_name] = pseudonymize_series(df[column_name], col.get('type', 'text'), secret)
+                print(f"Data pseudonymized for {column_name}")
+            elif mode == "obfuscate" and col.get('engine') == 'rule':
+                print(f"Obfuscating the data in column {column_name} with a derived rule")
+                updated_df[column_name] = rule_obfuscate_series(
+                    df[column_name], column_name, instruction, secret, mapping=mappings.setdefault(column_name, {}),
+                    rules=rules, batch_size=batch_size, concurrency=concurrency
+                )
+                print(f"Data obfuscated for {column_name}")
+            elif mode == "obfuscate":
+                print(f"Obfuscating the data in column {column_name}")
+                updated_df[column_name] = obfuscate_series(
+                    df[column_name], instruction, mapping=mappings.setdefault(column_name, {}), secret=secret,
+                    batch_size=batch_size, concurrency=concurrency
+                )
+                print(f"Data obfuscated for {column_name}")
+    return updated_df
+
+def is_local_plan(column_info):
+    # Plans that never call the LLM can run in worker processes
+    return all(
+        col.get('mode') != 'obfuscate' or col.get('engine') == 'local'
+        for col in column_info
+    )
+
+def _stream_csv(source, out, transform, chunk_size, write_header=True, **read_kwargs):
+    # Header goes out with the first chunk, every later chunk is appended
+    rows = 0
+    for chunk in read_csv(source, chunksize=int(chunk_size), **read_kwargs):
+        transform(chunk).to_csv(out, index=False, header=write_header and rows == 0)
+        rows += len(chunk)
+        print(f"Processed {rows} rows")
+    return rows
+
 def maskobfcsv(json_data):
+    """
+    Mask/obfuscate the columns of a CSV file according to the request plan.
+
+    Set 'chunkSize' in the request to stream the file in row chunks, so peak
+    memory depends on the chunk size rather than the file size. 'batchSize'
+    and 'concurrency' control how obfuscated columns are sent to the LLM;
+    'secret' keys the local engine and the saved mappings.
+
+    With 'io': 'arrow', or whenever Parquet is read or written, the file goes
+    through the pyarrow columnar path instead, which only parses the planned
+    columns into pandas. 'outputFormat' is 'csv' or 'parquet' and defaults
+    to the input's format.
+
+    With 'incremental': true, a checkpoint in the server cache, keyed by the
+    output path, records how far the input was processed. The next run only processes rows appended since
+    and appends them to the output, reusing the saved obfuscation mappings;
+    if the plan or the processed part of the input changed it rebuilds.
+
+    'workers' above 1 runs plans that don't call the LLM (masks and the local
+    engine) on a process pool, one row range of the file per worker, with
+    output byte-identical to a serial run.
+
+    Returns:
+        dict: 'output' path of the written file, 'rows' processed and, for each
+            obfuscated column, its 'distinct'/'total' values and their 'ratio'
+    """
     filename = json_data['fileName']
     input_path = json_data.get('inputPath', '')  # Get inputPath from JSON
     if not input_path:
@@ -25,49 +155,76 @@ def maskobfcsv(json_data):
     # Validate input file exists
     if not os.path.exists(input_path):
         raise Exception(f"Input file not found: {input_path}")
-    
-    df = pd.read_csv(input_path)
-    
+
     # Generate output filename using outputPath if provided
     output_path = json_data.get('outputPath', '')
     base_name = os.path.splitext(filename)[0]
-    output_filename = f"{base_name}-output.csv"
-    csv_output_file = os.path.join(
+    output_format = json_data.get('outputFormat', 'parquet' if is_parquet(filename) else 'csv')
+    output_filename = f"{base_name}-output.{output_format}"
+    output_file = os.path.join(
         output_path if output_path else os.path.join('..', 'client', 'public'),
         output_filename
     )
-    
-    updated_df = df.copy()
-    og_headers = set(df.columns.tolist())
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    print(f"Output file is {output_file}")
+
     column_info = json_data['headers']
+    chunk_size = json_data.get('chunkSize')
+    batch_size = int(json_data.get('batchSize', BATCH_SIZE))
+    concurrency = int(json_data.get('concurrency', CONCURRENCY))
+    secret = json_data.get('secret')
+    workers = int(json_data.get('workers', 1))
+    mappings = {}
+    rules = {}
 
-    for col in column_info:
-        column_name = col['name']
-        mode = col['mode']
-        instruction = col['prompt']
+    transform = lambda frame: apply_plan(frame, column_info, batch_size, concurrency, mappings, secret, rules)
 
-        if column_name in og_headers:
-            if mode == "mask":
-                print(f"Masking the data in column {column_name}")
-                updated_df[column_name] = df[column_name].apply(lambda x: '#' * len(str(x)))
-                print(f"Data masked for {column_name}")
-            elif mode == "obfuscate":
-                print(f"Obfuscating the data in column {column_name}")
-                csvCol = df[column_name]
-                data_string = ','.join(csvCol.astype(str))
-                modified_data_string = chatlocal(instruction, data_string)
-                modified_chunk = modified_data_string.split(',')
-                print("Modified Chunk: ", modified_chunk)
-                for x in range(min(len(csvCol), len(modified_chunk))):
-                    updated_df.loc[x, column_name] = modified_chunk[x]
-                print
-    
-    print(updated_df["Address"])
-    updated_df = updated_df.iloc[1:]
-    os.makedirs(os.path.dirname(csv_output_file), exist_ok=True)
-    print(f"csv_output_file is {csv_output_file}")
-    updated_df.to_csv(csv_output_file, index=False)
-    updated_df.to_csv("D:\Softwares\Codes\Fidelius\client\public\Ecommerce-Customers-2-output.csv",index=False)
-    updated_df.to_csv("D:\Softwares\Codes\Fidelius\client\public\Ecommerce-Customers-output.csv",index=False)
-    print(f"Output saved to: {csv_output_file}")
-    return csv_output_file
\ No newline at end of file
+    if json_data.get('incremental'):
+        if is_parquet(input_path) or is_parquet(output_file):
+            raise Exception("Incremental mode only supports CSV input and output")
+        digest = hashlib.sha256()
+        checkpoint = load_checkpoint(output_file, input_path, json_data, digest)
+        if checkpoint:
+            start, rows, columns = checkpoint['offset'], checkpoint['rows'], checkpoint['columns']
+            mappings.update(checkpoint['mappings'])
+            rules.update(checkpoint.get('rules', {}))
+            read_kwargs = {'header': None, 'names': columns}
+        else:
+            digest = hashlib.sha256()
+            start, rows, columns = 0, 0, read_csv(input_path, nrows=0).columns.tolist()
+            read_kwargs = {}
+        # A first build takes the whole file; later runs take a last row
+        # without a newline only once the input has stopped changing
+        end = record_end(input_path, start, final=not checkpoint or is_stable(input_path))
+        update_hash(digest, input_path, start, end)
+        print(f"Processing input bytes {start} to {end}")
+        with open(output_file, 'a' if checkpoint else 'w', newline='') as out:
+            if end > start:
+                with io.BufferedReader(BoundedReader(input_path, start, end)) as source:
+                    rows += _stream_csv(source, out, transform, chunk_size or INCREMENTAL_CHUNK_SIZE, not checkpoint, **read_kwargs)
+            elif not checkpoint:
+                pd.DataFrame(columns=columns).to_csv(out, index=False)
+        save_checkpoint(output_file, json_data, end, digest.hexdigest(), rows, columns, mappings, rules)
+    elif json_data.get('io') == 'arrow' or is_parquet(input_path) or is_parquet(output_file):
+        planned = [col['name'] for col in column_info if col.get('mode')]
+        rows = convert_columnar(input_path, output_file, planned, transform)
+    elif workers > 1 and is_local_plan(column_info):
+        rows = run_sharded(input_path, output_file, workers, apply_plan, {'column_info': column_info, 'secret': secret})
+    elif chunk_size:
+        if workers > 1:
+            print("Plan calls the LLM, running on a single worker")
+        with open(output_file, 'w', newline='') as out:
+            rows = _stream_csv(input_path, out, transform, chunk_size)
+            if rows == 0:
+                read_csv(input_path, nrows=0).to_csv(out, index=False)
+    else:
+        df = read_csv(input_path)
+        transform(df).to_csv(output_file, index=False)
+        rows = len(df)
+
+    print(f"Output saved to: {output_file}")
+    columns = {
+        name: {'distinct': len(mapping), 'total': rows, 'ratio': len(mapping) / rows if rows else 0}
+        for name, mapping in mappings.items()
+    }
+    return {'output': output_file, 'rows': rows, 'columns': columns}
@@ -0,0 +1,71 @@
+import gzip
+import json
+import os
+import threading
+
+CACHE_DIR = os.environ.get('FIDELIUS_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache'))
+MAX_CACHE_BYTES = 512 * 1024 * 1024
+
+class DiskCache:
+    """
+    Size-bounded on-disk cache of JSON values, one gzip file per key.
+
+    Reads refresh a file's mtime, so evicting the oldest mtimes first once
+    the directory passes `max_bytes` drops the least recently used entries.
+    Writes go to a temporary file and are renamed into place, so a crash or
+    a concurrent reader never sees half an entry.
+    """
+
+    def __init__(self, name, max_bytes=MAX_CACHE_BYTES, directory=CACHE_DIR):
+        self.directory = os.path.join(directory, name)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.json.gz')
+
+    def get(self, key):
+        """Return the value stored under key, or None."""
+        path = self._path(key)
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as file:
+                value = json.load(file)
+            os.utime(path)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def put(self, key, value):
+        path = self._path(key)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with gzip.open(temp_path, 'wt', encoding='utf-8', compresslevel=6) as file:
+            json.dump(value, file, separators=(',', ':'))
+        os.replace(temp_path, path)
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.json.gz'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,88 @@
+import threading
+import time
+
+# Process-wide Presidio engines: building an analyzer loads the spaCy model,
+# which takes seconds, so each engine is built once and shared by every
+# request (and every thread) in the process
+_engines = {}
+_stats = {}
+_lock = threading.RLock()
+_config = {}
+
+def _build(name):
+    from presidio_image_redactor import ImageAnalyzerEngine
+    if name == 'analyzer':
+        return ImageAnalyzerEngine()
+    raise Exception(f"Unknown engine: {name}")
+
+def _load(name):
+    with _lock:
+        if name not in _engines:
+            started = time.perf_counter()
+            _engines[name] = _build(name)
+            _stats[name] = {'load_seconds': round(time.perf_counter() - started, 3), 'uses': 0}
+            print(f"Loaded {name} engine in {_stats[name]['load_seconds']}s")
+        return _engines[name]
+
+def get_engine(name):
+    """
+    Return the shared engine, building it on first use.
+
+    Args:
+        name (str): 'analyzer' (ImageAnalyzerEngine); redaction boxes are
+            drawn directly, so no redactor engine is kept
+    """
+    with _lock:
+        engine = _load(name)
+        _stats[name]['uses'] += 1
+        return engine
+
+def get_analyzer():
+    return get_engine('analyzer')
+
+def warm(background=False):
+    """
+    Build the engines ahead of the first request.
+
+    Args:
+        background (bool): Build on a daemon thread and return at once;
+            requests that arrive first wait for the build to finish
+    """
+    def load():
+        try:
+            _load('analyzer')
+        except Exception as e:
+            print(f"Could not warm image engines: {str(e)}")
+    if background:
+        thread = threading.Thread(target=load, daemon=True)
+        thread.start()
+        return thread
+    load()
+
+def engine_config():
+    """
+    What the engines' output depends on: library versions, the spaCy model
+    and the Tesseract binary. Cached results are only valid for the same
+    configuration.
+    """
+    with _lock:
+        if 'config' not in _config:
+            from importlib.metadata import version
+            import pytesseract
+            try:
+                tesseract = str(pytesseract.get_tesseract_version())
+            except Exception:
+                tesseract = 'missing'
+            _config['config'] = {
+                'presidio_image_redactor': version('presidio_image_redactor'),
+                'presidio_analyzer': version('presidio_analyzer'),
+                # The analyzer is built with Presidio's default model
+                'spacy_model': 'en_core_web_lg',
+                'tesseract': tesseract,
+            }
+        return dict(_config['config'])
+
+def engine_stats():
+    """Load time in seconds and number of uses for each engine built so far."""
+    with _lock:
+        return {name: dict(stats) for name, stats in _stats.items()}
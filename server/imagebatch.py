@@ -0,0 +1,99 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.tif', '.tiff')
+# Wall-clock seconds one image (all its frames and tiles) may take; OCR still
+# running at the limit is killed
+IMAGE_TIMEOUT = 120
+
+def is_image(path):
+    return path.lower().endswith(IMAGE_EXTENSIONS)
+
+def _init_worker():
+    # Each worker process loads its own engines once, before its first image
+    from engines import warm
+    warm()
+
+def _redact_one(file_path, entities_to_redact, fill_color, timeout, frame_workers=1):
+    # Runs in a worker process; errors are reported per image rather than
+    # raised, so one bad file does not end the batch. The timeout is one
+    # deadline for the whole image: every frame and OCR tile gets what is
+    # left of it, and finishing past it is reported as a timeout too
+    from imagehandler import analyze_file, redact_image, redact_tiff, is_tiff, remaining
+    started = time.perf_counter()
+    deadline = time.time() + timeout if timeout else None
+    result = {'filePath': file_path, 'pid': os.getpid()}
+    try:
+        if is_tiff(file_path):
+            # Multi-page files stream frame by frame within this worker
+            redacted = redact_tiff(file_path, entities_to_redact, fill_color, workers=frame_workers, deadline=deadline)
+            output_path, entities = redacted['output'], redacted['entities']
+            result['frames'] = redacted['frames']
+        else:
+            analysis = analyze_file(file_path, timeout=remaining(deadline) if deadline else None)
+            output_path = redact_image(file_path, entities_to_redact=entities_to_redact, fill_color=fill_color)
+            entities = sorted({item['entity_type'] for item in analysis['results']})
+        if deadline:
+            remaining(deadline)
+        result.update({
+            'status': 'ok',
+            'entities': entities,
+            'output': output_path,
+            'filename': os.path.basename(output_path),
+        })
+    except Exception as e:
+        timed_out = 'timeout' in str(e).lower()
+        result.update({'status': 'timeout' if timed_out else 'error', 'error': str(e)})
+    result['seconds'] = round(time.perf_counter() - started, 3)
+    return result
+
+def redact_images(paths, entities_to_redact=None, fill_color=(255, 192, 203), workers=None, timeout=IMAGE_TIMEOUT, frame_workers=1):
+    """
+    Redact many images on a process pool, yielding results as they finish.
+
+    Every worker warms its own Presidio engines once and then OCRs, analyzes
+    and redacts whole images, so throughput scales with the number of cores.
+    The timeout is a wall-clock deadline per image: OCR (every tile and
+    frame) gets what is left of it and is killed at the limit, and an image
+    that finishes late is reported as a timeout.
+
+    Args:
+        paths (list): Image paths; other files are reported as skipped
+        entities_to_redact (list): Entity types to paint; all if not given
+        fill_color (tuple): RGB fill
+        workers (int): Processes, defaults to the CPU count
+        timeout (float): Wall-clock seconds allowed per image, frames and
+            tiles included
+        frame_workers (int): Processes each worker uses for the frames of
+            a multi-page TIFF
+
+    Yields:
+        dict: Per image, in completion order: 'filePath', 'status' ('ok',
+            'skipped', 'timeout' or 'error'), 'seconds', and 'entities',
+            'output' and 'filename' when redacted or 'error' when not
+    """
+    images = []
+    for path in paths:
+        if not is_image(path):
+            yield {'filePath': path, 'status': 'skipped', 'seconds': 0}
+        elif not os.path.exists(path):
+            yield {'filePath': path, 'status': 'error', 'error': f"Image file not found: {path}", 'seconds': 0}
+        else:
+            images.append(path)
+    if not images:
+        return
+    workers = max(1, min(workers or os.cpu_count() or 1, len(images)))
+    print(f"Redacting {len(images)} images on {workers} processes")
+    fill_color = tuple(fill_color)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        futures = {
+            pool.submit(_redact_one, path, entities_to_redact, fill_color, timeout, frame_workers): path
+            for path in images
+        }
+        for future in as_completed(futures):
+            try:
+                yield future.result()
+            except Exception as e:
+                # The worker itself died; the pool cannot take more work
+                yield {'filePath': futures[future], 'status': 'error', 'error': str(e), 'seconds': 0}
@@ -0,0 +1,79 @@
+import io
+
+# Output format name -> (PIL format, extension, MIME type)
+FORMATS = {
+    'png': ('PNG', '.png', 'image/png'),
+    'jpeg': ('JPEG', '.jpg', 'image/jpeg'),
+    'webp': ('WEBP', '.webp', 'image/webp'),
+    'tiff': ('TIFF', '.tif', 'image/tiff'),
+}
+# Keep the input's format unless the caller picks one
+DEFAULT_FORMAT = 'source'
+# PIL formats written as one of FORMATS: MPO is how PIL reports camera
+# JPEGs carrying extra frames, and the first frame is a plain JPEG
+SOURCE_FORMATS = {'mpo': 'jpeg'}
+# Per-format default level: zlib level for PNG (1 trades a little size for
+# speed against PIL's 6), quality for JPEG and WebP
+DEFAULT_LEVELS = {'png': 1, 'jpeg': 90, 'webp': 85}
+
+def resolve_format(source_format, output_format=DEFAULT_FORMAT):
+    """
+    Pick the output format name.
+
+    Args:
+        source_format (str): PIL format of the input, e.g. 'JPEG'
+        output_format (str): 'source' or one of FORMATS
+
+    Returns:
+        str: A key of FORMATS; inputs in other formats are written as PNG
+    """
+    output_format = (output_format or DEFAULT_FORMAT).lower()
+    if output_format == 'jpg':
+        output_format = 'jpeg'
+    if output_format == DEFAULT_FORMAT:
+        output_format = (source_format or '').lower()
+        output_format = SOURCE_FORMATS.get(output_format, output_format)
+        return output_format if output_format in FORMATS else 'png'
+    if output_format not in FORMATS:
+        raise Exception(f"Unsupported output format: {output_format}, expected one of {', '.join(FORMATS)}")
+    return output_format
+
+def _options(output_format, level):
+    if level is None:
+        level = DEFAULT_LEVELS.get(output_format)
+    if output_format == 'png':
+        return {'compress_level': int(level)}
+    if output_format in ('jpeg', 'webp'):
+        return {'quality': int(level)}
+    return {'compression': 'tiff_lzw'}
+
+def _convert(image, output_format):
+    # JPEG has no alpha or palette; everything else takes the image as is
+    if output_format == 'jpeg' and image.mode not in ('RGB', 'L', 'CMYK'):
+        return image.convert('RGB')
+    if output_format == 'webp' and image.mode not in ('RGB', 'RGBA'):
+        return image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+    return image
+
+def write_image(image, destination, output_format, level=None):
+    """
+    Encode an image to a path or file object.
+
+    Args:
+        image (PIL.Image): The image
+        destination: Path or binary file object
+        output_format (str): A key of FORMATS
+        level (int): Compression level (PNG, 0-9) or quality (JPEG/WebP,
+            1-100); the format's default if not given
+    """
+    pil_format = FORMATS[output_format][0]
+    _convert(image, output_format).save(destination, pil_format, **_options(output_format, level))
+
+def encode_image(image, output_format, level=None):
+    """Encode an image in memory; returns (bytes, MIME type)."""
+    buffer = io.BytesIO()
+    write_image(image, buffer, output_format, level)
+    return buffer.getvalue(), FORMATS[output_format][2]
+
+def extension(output_format):
+    return FORMATS[output_format][1]
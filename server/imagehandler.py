@@ -1,99 +1,435 @@
-from presidio_image_redactor import ImageRedactorEngine, ImageAnalyzerEngine
-from PIL import Image
+from engines import get_analyzer, engine_config
+from imageprep import normalize, ocr_tiled, rescale, TARGET_DPI, GRAYSCALE, BINARIZE, TILE_SIZE, TILE_OVERLAP
+from diskcache import DiskCache
+from imageencode import resolve_format, write_image, encode_image, extension, DEFAULT_FORMAT
+from sessions import SessionStore, file_hash
+from PIL import Image, ImageDraw, TiffImagePlugin
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import io
+import json
 import os
+import time
 import pytesseract
 
-# Configure Tesseract path
-pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+# Configure Tesseract path; elsewhere tesseract is expected on PATH
+TESSERACT_CMD = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+if os.path.exists(TESSERACT_CMD):
+    pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
+
+# Content hash -> analyze_image result, so listing entities and redacting
+# (or redacting again with other entities) OCR the image once
+analyses = SessionStore()
+# The same, across restarts: content hash + configuration -> packed analysis
+analysis_cache = DiskCache('image')
+WORD_KEYS = ('text', 'conf', 'left', 'top', 'width', 'height')
+RESULT_KEYS = ('entity_type', 'score', 'start', 'end', 'left', 'top', 'width', 'height')
+
+TIFF_EXTENSIONS = ('.tif', '.tiff')
+TIFF_COMPRESSION = 'tiff_lzw'
+# Frame modes painted as they are; others are converted to RGB
+TIFF_MODES = ('1', 'L', 'RGB', 'RGBA')
+# Source compressions kept on output: lossless, so re-encoding a frame does
+# not degrade it (JPEG-compressed frames are written with TIFF_COMPRESSION)
+TIFF_KEEP_COMPRESSION = ('raw', 'tiff_lzw', 'tiff_deflate', 'tiff_adobe_deflate', 'packbits', 'group3', 'group4')
+# Frames queued per worker process ahead of the one being written
+FRAMES_PER_WORKER = 2
+
+def remaining(deadline):
+    """
+    Seconds left before a time.time() deadline.
+
+    Raises:
+        RuntimeError: If the deadline has passed
+    """
+    left = deadline - time.time()
+    if left <= 0:
+        raise RuntimeError("Image processing timeout")
+    return left
+
+def analyze_image(image, analyzer_engine=None, timeout=None, dpi=TARGET_DPI, grayscale=GRAYSCALE, binarize=BINARIZE):
+    """
+    Run OCR and PII analysis on an open image, once.
+
+    The same steps as ImageAnalyzerEngine.analyze, but the OCR words are
+    kept alongside the results, so callers can list entities and draw
+    redactions from one pass. The image is normalized first (see
+    imageprep.normalize); images still larger than imageprep.TILE_SIZE are
+    OCR'd as overlapping tiles in parallel. Boxes are always in the
+    original image's pixels.
+
+    Args:
+        image (PIL.Image): The image
+        analyzer_engine (ImageAnalyzerEngine): Engine to use instead of the
+            shared one from engines
+        timeout (float): Seconds allowed for the whole analysis; every OCR
+            call (each tile of a large image) gets what is left, and a
+            RuntimeError is raised once it runs out; no limit if not given
+        dpi (int): Resolution finer scans are downscaled to
+        grayscale (bool): OCR a grayscale copy
+        binarize (bool): OCR a black and white copy
+
+    Returns:
+        dict: 'size' [width, height], 'text' the OCR text, 'words' with the
+            text, conf and pixel box of each OCR word, and 'results' with the
+            entity_type, score, start/end in the text and pixel box (left,
+            top, width, height) of each detected entity
+    """
+    if analyzer_engine is None:
+        analyzer_engine = get_analyzer()
+    deadline = time.time() + timeout if timeout else None
+
+    def ocr(part):
+        ocr_kwargs = {'timeout': remaining(deadline)} if deadline else {}
+        processed, metadata = analyzer_engine.image_preprocessor.preprocess_image(part)
+        ocr_result = analyzer_engine.ocr.perform_ocr(processed, **ocr_kwargs)
+        ocr_result = analyzer_engine.remove_space_boxes(ocr_result)
+        if metadata and "scale_factor" in metadata:
+            ocr_result = analyzer_engine._scale_bbox_results(ocr_result, metadata["scale_factor"])
+        return ocr_result
+
+    normalized, scale = normalize(image, dpi, grayscale, binarize)
+    if max(normalized.size) > TILE_SIZE:
+        ocr_result = ocr_tiled(normalized, ocr)
+    else:
+        ocr_result = ocr(normalized)
+    ocr_result = rescale(ocr_result, scale)
+
+    text = analyzer_engine.ocr.get_text_from_ocr_dict(ocr_result)
+    text_results = analyzer_engine.analyzer_engine.analyze(text=text, language="en")
+    boxes = analyzer_engine.map_analyzer_results_to_bounding_boxes(text_results, ocr_result, text, [])
+    if deadline:
+        # Entity detection cannot be interrupted, but running past the limit
+        # still counts as a timeout
+        remaining(deadline)
+
+    words = [
+        {
+            'text': word,
+            'conf': float(conf),
+            'left': int(left), 'top': int(top), 'width': int(width), 'height': int(height),
+        }
+        for word, conf, left, top, width, height in zip(
+            ocr_result['text'], ocr_result['conf'], ocr_result['left'],
+            ocr_result['top'], ocr_result['width'], ocr_result['height'],
+        )
+    ]
+    results = [
+        {
+            'entity_type': box.entity_type,
+            'score': round(float(box.score), 3),
+            'start': int(box.start), 'end': int(box.end),
+            'left': int(box.left), 'top': int(box.top), 'width': int(box.width), 'height': int(box.height),
+        }
+        for box in boxes
+    ]
+    return {'size': list(image.size), 'text': text, 'words': words, 'results': results}
+
+def _config_key():
+    # Everything besides the image bytes that changes the analysis
+    config = dict(
+        engine_config(), dpi=TARGET_DPI, grayscale=GRAYSCALE, binarize=BINARIZE,
+        tile=TILE_SIZE, overlap=TILE_OVERLAP,
+    )
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()[:16]
+
+def _pack(analysis):
+    # Column lists instead of one dict per word, which gzips far smaller
+    return {
+        'size': analysis['size'],
+        'text': analysis['text'],
+        'words': [[word[key] for word in analysis['words']] for key in WORD_KEYS],
+        'results': [[result[key] for result in analysis['results']] for key in RESULT_KEYS],
+    }
+
+def _unpack(packed):
+    return {
+        'size': packed['size'],
+        'text': packed['text'],
+        'words': [dict(zip(WORD_KEYS, row)) for row in zip(*packed['words'])],
+        'results': [dict(zip(RESULT_KEYS, row)) for row in zip(*packed['results'])],
+    }
+
+def analyze_file(file_path, timeout=None, frame=0, digest=None):
+    """
+    Analyze an image file, reusing the analysis of identical content.
+
+    Analyses are kept in memory and in a size-bounded on-disk cache keyed
+    by the image's content hash and the engine configuration, so an image
+    seen before, in this process or an earlier one, is not OCR'd again.
+
+    Args:
+        file_path (str): Path to the image
+        timeout (float): OCR time limit in seconds, see analyze_image
+        frame (int): Frame of a multi-frame file (TIFF) to analyze; only
+            that frame is decoded
+        digest (str): The file's file_hash, when the caller already has it
+
+    Raises:
+        FileNotFoundError: If the image file doesn't exist
+    """
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"Image file not found: {file_path}")
+    key = f"{digest or file_hash(file_path)}-{_config_key()}"
+    if frame:
+        key = f"{key}-{frame}"
+    analysis = analyses.get(key)
+    if analysis is not None:
+        print(f"Reusing analysis for {file_path}")
+        return analysis
+    packed = analysis_cache.get(key)
+    if packed is not None:
+        print(f"Loaded cached analysis for {file_path}")
+        analysis = _unpack(packed)
+    else:
+        with Image.open(file_path) as image:
+            image.seek(frame)
+            analysis = analyze_image(image, timeout=timeout)
+        analysis_cache.put(key, _pack(analysis))
+    analyses.put(key, analysis)
+    return analysis
+
+def analysis_cache_stats():
+    """Hits and misses of the on-disk analysis cache in this process."""
+    return analysis_cache.stats()
+
+def draw_redactions(image, results, entities_to_redact=None, fill_color=(255, 192, 203)):
+    """
+    Paint over detected entities on a copy of the image.
+
+    Args:
+        image (PIL.Image): The original image
+        results (list): 'results' from analyze_image
+        entities_to_redact (list): Entity types to paint; all if not given
+        fill_color: RGB tuple, or an int for 'L' and '1' images
+
+    Returns:
+        PIL.Image: The redacted copy
+    """
+    redacted = image.copy()
+    draw = ImageDraw.Draw(redacted)
+    for result in results:
+        if entities_to_redact and result['entity_type'] not in entities_to_redact:
+            continue
+        x0, y0 = result['left'], result['top']
+        draw.rectangle([x0, y0, x0 + result['width'], y0 + result['height']], fill=fill_color)
+    return redacted
+
+def is_tiff(file_path):
+    return file_path.lower().endswith(TIFF_EXTENSIONS)
+
+def frame_count(file_path):
+    with Image.open(file_path) as image:
+        return getattr(image, 'n_frames', 1)
+
+def _frame_fill(mode, fill_color):
+    # Bilevel frames are redacted in black: a fill lighter than the paper
+    # would not show where something was removed. Greyscale frames take the
+    # fill's luminance
+    if mode == '1':
+        return 0
+    if mode == 'L':
+        red, green, blue = fill_color[:3]
+        return (red * 299 + green * 587 + blue * 114) // 1000
+    return fill_color
+
+def _redact_frame(file_path, frame, digest, entities_to_redact, fill_color, timeout, deadline=None):
+    # One frame, decoded, analyzed (or looked up) and painted on its own;
+    # runs in a worker process when redact_tiff has several. The frame keeps
+    # its mode and, when lossless, its compression, so a bilevel fax page
+    # stays a small Group 4 page
+    if deadline:
+        timeout = min(timeout or float('inf'), remaining(deadline))
+    analysis = analyze_file(file_path, timeout=timeout, frame=frame, digest=digest)
+    with Image.open(file_path) as image:
+        image.seek(frame)
+        compression = image.info.get('compression')
+        if compression not in TIFF_KEEP_COMPRESSION:
+            compression = TIFF_COMPRESSION
+        frame_image = image if image.mode in TIFF_MODES else image.convert('RGB')
+        if frame_image.mode != '1' and compression in ('group3', 'group4'):
+            compression = TIFF_COMPRESSION
+        fill = _frame_fill(frame_image.mode, fill_color)
+        redacted = draw_redactions(frame_image, analysis['results'], entities_to_redact, fill)
+    return redacted, compression, {result['entity_type'] for result in analysis['results']}
+
+def redact_tiff(file_path, entities_to_redact=None, fill_color=(255, 192, 203), workers=1, timeout=None, output_path=None, deadline=None):
+    """
+    Redact a multi-page TIFF one frame at a time.
+
+    Each frame is read, analyzed and redacted on its own and appended to
+    the output TIFF before the next is taken, so memory holds one frame
+    per worker rather than the whole document. With several workers,
+    frames are farmed out to processes a few at a time and still written
+    in page order.
+
+    Args:
+        file_path (str): Path to the TIFF
+        entities_to_redact (list): Entity types to paint; all if not given
+        fill_color (tuple): RGB fill; greyscale frames take its luminance
+            and bilevel frames are filled black
+        workers (int): Processes; 1 redacts in this process
+        timeout (float): Analysis seconds allowed per frame
+        output_path (str): Where to write, a path or binary file object;
+            defaults to <name>_redacted.tif next to the input
+        deadline (float): time.time() by which the whole file must be
+            done; each frame gets at most what is left
+
+    Returns:
+        dict: 'output' path, number of 'frames' and the 'entities' found
+    """
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"Image file not found: {file_path}")
+    if output_path is None:
+        base_name = os.path.splitext(os.path.basename(file_path))[0]
+        output_path = os.path.join(os.path.dirname(file_path), f"{base_name}_redacted.tif")
+    frames = frame_count(file_path)
+    digest = file_hash(file_path)
+    fill_color = tuple(fill_color)
+    entities = set()
+
+    def append(output, redacted, compression):
+        redacted.save(output, format='TIFF', compression=compression)
+        output.newFrame()
+
+    with TiffImagePlugin.AppendingTiffWriter(output_path, True) as output:
+        if workers <= 1 or frames == 1:
+            for frame in range(frames):
+                redacted, compression, found = _redact_frame(file_path, frame, digest, entities_to_redact, fill_color, timeout, deadline)
+                append(output, redacted, compression)
+                entities.update(found)
+        else:
+            from engines import warm
+            with ProcessPoolExecutor(max_workers=workers, initializer=warm) as pool:
+                # Keep a bounded window of frames in flight and write them
+                # in order as the oldest finishes
+                pending = []
+                for frame in range(frames):
+                    pending.append(pool.submit(
+                        _redact_frame, file_path, frame, digest, entities_to_redact, fill_color, timeout, deadline
+                    ))
+                    if len(pending) >= workers * FRAMES_PER_WORKER:
+                        redacted, compression, found = pending.pop(0).result()
+                        append(output, redacted, compression)
+                        entities.update(found)
+                for future in pending:
+                    redacted, compression, found = future.result()
+                    append(output, redacted, compression)
+                    entities.update(found)
+    print(f"Redacted {frames} frames of {file_path}")
+    return {'output': output_path, 'frames': frames, 'entities': sorted(entities)}
 
 def predict_image_entities(file_path):
     """
     Predict PII entities in an image using Presidio Image Redactor.
-    
+
     Args:
         file_path (str): Path to the input image
-    
+
     Returns:
         list: List of detected PII entity types
-    
+
     Raises:
         FileNotFoundError: If the image file doesn't exist
         Exception: For other errors during processing
     """
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"Image file not found: {file_path}")
-        
+
     try:
-        # Initialize the analyzer engine first
-        analyzer_engine = ImageAnalyzerEngine()
-        
-        # Open the image
-        with Image.open(file_path) as img:
-            # Analyze the image to detect PII entities
-            analysis_results = analyzer_engine.analyze(img)
-            
-            # Extract unique entity types from the analysis
-            entities = {result.entity_type for result in analysis_results}
-            
-            return list(entities)
-    
+        # Extract unique entity types from the analysis of every frame
+        entities = set()
+        digest = file_hash(file_path)
+        for frame in range(frame_count(file_path)):
+            analysis = analyze_file(file_path, frame=frame, digest=digest)
+            entities.update(result['entity_type'] for result in analysis['results'])
+
+        return list(entities)
+
     except Exception as e:
         raise Exception(f"Error predicting image entities: {str(e)}")
 
-def redact_image(file_path, entities_to_redact=None, fill_color=(255, 192, 203)):
+def _redacted_image(file_path, entities_to_redact, fill_color):
+    analysis = analyze_file(file_path)
+    with Image.open(file_path) as image:
+        # Paint the detected entities, or only the requested ones
+        return draw_redactions(image, analysis['results'], entities_to_redact, fill_color), image.format
+
+def redact_image(file_path, entities_to_redact=None, fill_color=(255, 192, 203), output_format=DEFAULT_FORMAT, level=None, output_dir=None, workers=1):
     """
     Redact sensitive information from an image using Presidio Image Redactor.
-    
+
+    The OCR and analysis are shared with predict_image_entities and earlier
+    redactions of the same image, so only the fill boxes are drawn here when
+    the image has been seen before.
+
     Args:
         file_path (str): Path to the input image
         entities_to_redact (list): Optional list of specific PII entities to redact
         fill_color (tuple): RGB tuple for the redaction fill color (default: pink)
-    
+        output_format (str): 'source' to keep the input's format, or 'png',
+            'jpeg', 'webp' or 'tiff'
+        level (int): PNG compression level or JPEG/WebP quality, see
+            imageencode.write_image
+        output_dir (str): Directory to write to, defaults to the input's
+        workers (int): Processes redacting the frames of a TIFF
+
     Returns:
-        str: Path to the redacted image
-    
+        str: Path to the redacted image; TIFFs are redacted with redact_tiff
+            and keep all their frames
+
     Raises:
         FileNotFoundError: If the image file doesn't exist
         Exception: For other errors during processing
     """
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"Image file not found: {file_path}")
-        
+
+    # Generate output path in the given directory or next to the input
+    base_name = os.path.splitext(os.path.basename(file_path))[0]
+    output_dir = output_dir or os.path.dirname(file_path)
+    # Ensure output directory exists
+    os.makedirs(output_dir or '.', exist_ok=True)
+
+    if is_tiff(file_path):
+        output_path = os.path.join(output_dir, f"{base_name}_redacted.tif")
+        return redact_tiff(file_path, entities_to_redact, fill_color, workers=workers, output_path=output_path)['output']
+
     try:
-        # Initialize both analyzer and redactor engines
-        analyzer_engine = ImageAnalyzerEngine()
-        engine = ImageRedactorEngine(image_analyzer_engine=analyzer_engine)
-        
-        # Open the image using PIL
-        with Image.open(file_path) as image:
-            # Redact the image with the specified fill color and entities
-            if entities_to_redact:
-                redacted_image = engine.redact(
-                    image=image,
-                    fill=fill_color,
-                    entities=entities_to_redact
-                )
-            else:
-                redacted_image = engine.redact(
-                    image=image,
-                    fill=fill_color
-                )
-            
-            # Generate output path in the same directory as input
-            base_name = os.path.splitext(os.path.basename(file_path))[0]
-            output_dir = os.path.dirname(file_path)
-            output_path = os.path.join(
-                output_dir,
-                f"{base_name}_redacted.png"
-            )
-            
-            # Ensure output directory exists
-            os.makedirs(output_dir, exist_ok=True)
-            
-            # Save the redacted image
-            redacted_image.save(output_path, "PNG")
-            
+        redacted_image, source_format = _redacted_image(file_path, entities_to_redact, fill_color)
+        output_format = resolve_format(source_format, output_format)
+        output_path = os.path.join(output_dir, f"{base_name}_redacted{extension(output_format)}")
+
+        # Save the redacted image
+        write_image(redacted_image, output_path, output_format, level)
+
         return output_path
-    
+
+    except Exception as e:
+        raise Exception(f"Error redacting image: {str(e)}")
+
+def redact_image_bytes(file_path, entities_to_redact=None, fill_color=(255, 192, 203), output_format=DEFAULT_FORMAT, level=None, workers=1):
+    """
+    Redact an image like redact_image, but encode it in memory.
+
+    Returns:
+        tuple: The encoded image bytes and their MIME type; nothing is
+            written to disk
+
+    Raises:
+        FileNotFoundError: If the image file doesn't exist
+        Exception: For other errors during processing
+    """
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"Image file not found: {file_path}")
+    if is_tiff(file_path):
+        buffer = io.BytesIO()
+        redact_tiff(file_path, entities_to_redact, fill_color, workers=workers, output_path=buffer)
+        return buffer.getvalue(), 'image/tiff'
+
+    try:
+        redacted_image, source_format = _redacted_image(file_path, entities_to_redact, fill_color)
+        return encode_image(redacted_image, resolve_format(source_format, output_format), level)
+
     except Exception as e:
         raise Exception(f"Error redacting image: {str(e)}")
@@ -0,0 +1,151 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from PIL import Image
+
+# Scans above this resolution are downscaled to it before OCR; Tesseract
+# reads body text well at 300 DPI and gains nothing from more pixels
+TARGET_DPI = 300
+GRAYSCALE = True
+BINARIZE = False
+# Images larger than this on either side, after downscaling, are OCR'd as
+# overlapping tiles; the overlap must be wider than any word so every word
+# lies whole inside at least one tile
+TILE_SIZE = 2500
+TILE_OVERLAP = 200
+OCR_KEYS = ('text', 'conf', 'left', 'top', 'width', 'height')
+
+def _otsu(pixels):
+    # Threshold maximizing between-class variance of a grayscale histogram
+    histogram = np.bincount(pixels.ravel(), minlength=256).astype(float)
+    levels = np.arange(256)
+    weight = np.cumsum(histogram)
+    total = weight[-1]
+    mean = np.cumsum(histogram * levels)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        variance = (mean[-1] * weight - mean * total) ** 2 / (weight * (total - weight))
+    if np.isnan(variance).all():
+        # A single grey level: nothing to separate
+        return 127
+    return int(np.nanargmax(variance))
+
+def normalize(image, dpi=TARGET_DPI, grayscale=GRAYSCALE, binarize=BINARIZE):
+    """
+    Prepare an image for OCR.
+
+    Args:
+        image (PIL.Image): The original image
+        dpi (int): Resolution to downscale to when the image says it is
+            finer; images are never upscaled
+        grayscale (bool): Convert to 8-bit grayscale
+        binarize (bool): Threshold to black and white (Otsu); implies
+            grayscale
+
+    Returns:
+        tuple: The processed image and its scale relative to the original
+    """
+    source_dpi = image.info.get('dpi', (0, 0))[0]
+    scale = 1.0
+    if dpi and source_dpi and source_dpi > dpi:
+        scale = dpi / float(source_dpi)
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        image = image.resize(size, Image.LANCZOS)
+    if grayscale or binarize:
+        image = image.convert('L')
+    elif image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    if binarize:
+        threshold = _otsu(np.asarray(image))
+        image = image.point(lambda value: 255 if value > threshold else 0)
+    return image, scale
+
+def _starts(length, tile, overlap):
+    starts = [0]
+    while starts[-1] + tile < length:
+        starts.append(starts[-1] + tile - overlap)
+    return starts
+
+def _cores(length, tile, overlap):
+    starts = _starts(length, tile, overlap)
+    spans = []
+    for index, start in enumerate(starts):
+        core_start = start + overlap // 2 if index else 0
+        core_end = starts[index + 1] + overlap // 2 if index + 1 < len(starts) else length
+        spans.append((start, min(start + tile, length), core_start, core_end))
+    return spans
+
+def tiles(size, tile=TILE_SIZE, overlap=TILE_OVERLAP):
+    """
+    Split an image size into overlapping tiles.
+
+    Returns:
+        list: (box, core) per tile, both (left, top, right, bottom); the
+            cores split every overlap down its middle, so they cover the
+            image exactly once and decide which tile owns a word
+    """
+    width, height = size
+    found = []
+    for y0, y1, core_y0, core_y1 in _cores(height, tile, overlap):
+        for x0, x1, core_x0, core_x1 in _cores(width, tile, overlap):
+            found.append(((x0, y0, x1, y1), (core_x0, core_y0, core_x1, core_y1)))
+    return found
+
+def _reading_order(words):
+    # Group words into lines by vertical centre, then left to right, so
+    # multi-word entities split across tiles are read in sequence again
+    words = sorted(words, key=lambda word: word['top'] + word['height'] / 2)
+    lines = []
+    for word in words:
+        middle = word['top'] + word['height'] / 2
+        if lines and lines[-1][0] <= middle <= lines[-1][1]:
+            lines[-1][2].append(word)
+        else:
+            lines.append((word['top'], word['top'] + word['height'], [word]))
+    return [word for _, _, line in lines for word in sorted(line, key=lambda word: word['left'])]
+
+def ocr_tiled(image, ocr, tile=TILE_SIZE, overlap=TILE_OVERLAP, workers=None):
+    """
+    OCR an image tile by tile and merge the words into one OCR result.
+
+    Tiles run on threads: each OCR call waits on its own Tesseract process,
+    so they run in parallel. A word seen by two tiles is kept only from the
+    tile whose core holds its centre.
+
+    Args:
+        image (PIL.Image): The (normalized) image
+        ocr (callable): Image -> OCR dict with OCR_KEYS lists, in the
+            image's pixel coordinates
+        tile (int): Tile side in pixels
+        overlap (int): Pixels shared by neighbouring tiles
+        workers (int): Threads, defaults to the CPU count
+
+    Returns:
+        dict: OCR dict with OCR_KEYS lists for the whole image
+    """
+    boxes = tiles(image.size, tile, overlap)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(boxes)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(lambda item: ocr(image.crop(item[0])), boxes))
+
+    words = []
+    for ((x0, y0, _, _), (core_x0, core_y0, core_x1, core_y1)), result in zip(boxes, results):
+        for index in range(len(result['text'])):
+            word = {key: result[key][index] for key in OCR_KEYS}
+            word['left'] += x0
+            word['top'] += y0
+            middle_x = word['left'] + word['width'] / 2
+            middle_y = word['top'] + word['height'] / 2
+            if core_x0 <= middle_x < core_x1 and core_y0 <= middle_y < core_y1:
+                words.append(word)
+    words = _reading_order(words)
+    print(f"OCR'd {len(boxes)} tiles of {image.size[0]}x{image.size[1]}, {len(words)} words")
+    return {key: [word[key] for word in words] for key in OCR_KEYS}
+
+def rescale(ocr_result, scale):
+    """Map an OCR dict's boxes from processed pixels back to the original's."""
+    if scale == 1.0:
+        return ocr_result
+    scaled = dict(ocr_result)
+    for key in ('left', 'top', 'width', 'height'):
+        scaled[key] = [round(value / scale) for value in ocr_result[key]]
+    return scaled
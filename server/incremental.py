@@ -0,0 +1,143 @@
+import hashlib
+import io
+import json
+import os
+import time
+import numpy as np
+from diskcache import CACHE_DIR
+
+BLOCK_BYTES = 1 << 20
+# Checkpoints hold obfuscation mappings, so they stay in the server's cache
+# rather than next to outputs that may be served to clients
+CHECKPOINT_DIR = os.path.join(CACHE_DIR, 'checkpoints')
+# An input not modified for this long is not being appended to, so a last
+# row without a trailing newline is complete
+STABLE_SECONDS = 5
+
+class BoundedReader(io.RawIOBase):
+    """Read-only view of bytes [start, end) of a file."""
+
+    def __init__(self, path, start, end):
+        self._file = open(path, 'rb')
+        self._file.seek(start)
+        self._remaining = end - start
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._file.read(min(len(buffer), self._remaining))
+        self._remaining -= len(data)
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+def checkpoint_path(output_file):
+    name = hashlib.sha256(os.path.abspath(output_file).encode('utf-8')).hexdigest()
+    return os.path.join(CHECKPOINT_DIR, name + '.json')
+
+def plan_hash(json_data):
+    # Anything that changes what a row turns into invalidates the checkpoint
+    plan = {key: json_data.get(key) for key in ('headers', 'secret')}
+    return hashlib.sha256(json.dumps(plan, sort_keys=True).encode('utf-8')).hexdigest()
+
+def update_hash(digest, path, start, end):
+    with open(path, 'rb') as file:
+        file.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            block = file.read(min(BLOCK_BYTES, remaining))
+            if not block:
+                break
+            digest.update(block)
+            remaining -= len(block)
+    return digest
+
+def is_stable(path):
+    return time.time() - os.path.getmtime(path) >= STABLE_SECONDS
+
+def record_end(path, start, final=False):
+    """
+    Find the end of the last complete CSV record after start.
+
+    A newline ends a record only outside quotes; anything after the last such
+    newline is a row still being written and is left for the next run,
+    unless final is set.
+
+    Args:
+        path (str): CSV file
+        start (int): Byte offset to scan from
+        final (bool): The file is complete, so end of file outside quotes
+            also ends a record
+
+    Returns:
+        int: Byte offset just past the last complete record
+    """
+    end = start
+    parity = 0
+    position = start
+    with open(path, 'rb') as file:
+        file.seek(start)
+        while True:
+            block = file.read(BLOCK_BYTES)
+            if not block:
+                if final and parity == 0 and position > end:
+                    return position
+                return end
+            data = np.frombuffer(block, dtype=np.uint8)
+            quotes = (np.cumsum(data == ord('"')) + parity) % 2
+            newlines = np.flatnonzero((data == ord('\n')) & (quotes == 0))
+            if len(newlines):
+                end = position + int(newlines[-1]) + 1
+            parity = int(quotes[-1])
+            position += len(block)
+
+def load_checkpoint(output_file, input_path, json_data, digest):
+    """
+    Load the checkpoint for an output if it is still valid for this input.
+
+    Args:
+        digest: hashlib object fed the input prefix while checking it, so the
+            caller can extend it over the new rows instead of re-reading
+
+    Returns:
+        dict: The checkpoint, or None when the plan changed, the output is
+            gone, or the already-processed prefix of the input was modified
+    """
+    path = checkpoint_path(output_file)
+    if not os.path.exists(path) or not os.path.exists(output_file):
+        return None
+    with open(path, 'r') as file:
+        checkpoint = json.load(file)
+    if checkpoint.get('plan') != plan_hash(json_data):
+        print("Plan changed since the last run, rebuilding")
+        return None
+    if os.path.getsize(input_path) < checkpoint['offset']:
+        print("Input is shorter than at the last run, rebuilding")
+        return None
+    if update_hash(digest, input_path, 0, checkpoint['offset']).hexdigest() != checkpoint['prefix']:
+        print("Input was modified before the checkpoint, rebuilding")
+        return None
+    return checkpoint
+
+def save_checkpoint(output_file, json_data, offset, prefix, rows, columns, mappings, rules):
+    checkpoint = {
+        'offset': offset,
+        'prefix': prefix,
+        'rows': rows,
+        'plan': plan_hash(json_data),
+        'columns': columns,
+        'mappings': mappings,
+        # Rules derived for 'rule' engine columns, so later runs apply the
+        # same rule rather than deriving a new one
+        'rules': rules,
+    }
+    # Written aside and renamed so a crash never leaves half a checkpoint
+    os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+    temp_path = checkpoint_path(output_file) + '.tmp'
+    with open(temp_path, 'w') as file:
+        json.dump(checkpoint, file)
+    os.replace(temp_path, checkpoint_path(output_file))
@@ -0,0 +1,200 @@
+import numpy as np
+import pandas as pd
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+MASK_CHAR = '#'
+BLOCK_SIZE = 1_000_000
+
+def _runs(lengths):
+    # Each distinct run of mask characters is built once and looked up by length
+    lengths = lengths.clip(lower=0)
+    return lengths.map({n: MASK_CHAR * int(n) for n in lengths.unique()})
+
+def _full(series, keep):
+    return _runs(series.str.len())
+
+def _keep_last(series, keep):
+    if keep == 0:
+        return _full(series, keep)
+    column = _arrow_column(series)
+    if column is not None and column[2] is not None:
+        array, offsets, data = column
+        starts, ends = offsets[:-1], offsets[1:]
+        return _with_data(series, array, _mask_ranges(data, offsets, np.maximum(starts, ends - keep)))
+    return _runs(series.str.len() - keep) + series.str[-keep:]
+
+def _email_domain(series, keep):
+    column = _arrow_column(series)
+    if column is not None and column[2] is not None:
+        array, offsets, data = column
+        # Each '@' is placed in its value, and the first one of every value
+        # ends its masked part; values without one are masked to their end
+        ats = np.flatnonzero(data[offsets[0]:offsets[-1]] == ord('@')) + offsets[0]
+        rows = np.searchsorted(offsets, ats, side='right') - 1
+        first = np.ones(len(ats), dtype=bool)
+        np.not_equal(rows[1:], rows[:-1], out=first[1:])
+        stops = offsets[1:].copy()
+        stops[rows[first]] = ats[first]
+        return _with_data(series, array, _mask_ranges(data, offsets, stops))
+    at = series.str.find('@')
+    # Values without an '@' have nothing to keep and are fully masked
+    local = at.where(at >= 0, series.str.len())
+    return _runs(local) + pd.Series(
+        [value[start:] for value, start in zip(series.tolist(), local.tolist())], index=series.index, dtype=str
+    )
+
+# Columns held by pandas as Arrow strings are masked on their UTF-8 data
+# buffer directly: offsets and validity are reused and only the data bytes
+# are rewritten, so a policy costs a few NumPy passes over the column.
+
+def _arrow_column(series):
+    """
+    The Arrow array behind a string column with its offsets and data bytes.
+
+    Returns:
+        tuple: (array, offsets, data), data None if some value is not ASCII
+            (character and byte positions then differ), or None when the
+            column is not Arrow-backed
+    """
+    if pa is None or not (isinstance(series.dtype, pd.StringDtype) and series.dtype.storage == 'pyarrow'):
+        return None
+    array = pa.array(series)
+    if isinstance(array, pa.ChunkedArray):
+        array = array.combine_chunks()
+    _, offsets, data = array.buffers()
+    offset_type = np.int64 if pa.types.is_large_string(array.type) else np.int32
+    offsets = np.frombuffer(offsets, dtype=offset_type)[array.offset:array.offset + len(array) + 1]
+    data = np.frombuffer(data, dtype=np.uint8) if data is not None else np.zeros(0, dtype=np.uint8)
+    if len(data) and data.max() >= 0x80:
+        return array, offsets, None
+    return array, offsets, data
+
+def _with_data(series, array, data):
+    validity, offsets, _ = array.buffers()
+    masked = pa.Array.from_buffers(array.type, len(array), [validity, offsets, pa.py_buffer(data)], offset=array.offset)
+    return pd.Series(pd.array(masked, dtype=series.dtype), index=series.index)
+
+def _mask_ranges(data, offsets, stops):
+    # Mask bytes [start, stop) of every value, stop between the value's start
+    # and end. The buffer is then runs of kept and masked bytes: anything
+    # before the first value, each value's masked head and kept tail, and
+    # anything after the last; np.repeat expands them into the byte mask
+    runs = np.empty(2 * len(stops) + 2, dtype=np.int64)
+    runs[0] = offsets[0]
+    np.subtract(stops, offsets[:-1], out=runs[1:-1:2])
+    np.subtract(offsets[1:], stops, out=runs[2:-1:2])
+    runs[-1] = len(data) - offsets[-1]
+    fill = np.zeros(len(runs), dtype=np.uint8)
+    fill[1:-1:2] = 0xFF
+    # Branch-free select: data where the expanded fill is 0, MASK_CHAR where
+    # it is 0xFF
+    out = np.bitwise_xor(data, np.uint8(ord(MASK_CHAR)))
+    out &= np.repeat(fill, runs)
+    out ^= data
+    return out
+
+# The remaining policies work on bytes: a block of values is joined into one
+# UTF-8 buffer and the kernel returns which bytes to mask, so a column costs a
+# handful of NumPy passes instead of a Python call per cell.
+
+def _digits(data):
+    return (data >= ord('0')) & (data <= ord('9'))
+
+def _phone(data):
+    # Letters (extensions, vanity numbers) go too; separators stay in place
+    lower = data | 0x20
+    return _digits(data) | ((lower >= ord('a')) & (lower <= ord('z')))
+
+def join_values(values):
+    """
+    Join values into one UTF-8 byte buffer for NumPy kernels.
+
+    Returns:
+        tuple: (data, sep, separator) where sep marks the separator bytes, or
+            None if every candidate separator occurs inside some value
+    """
+    # Pick a separator that no value contains so the buffer splits back cleanly
+    for code in range(32):
+        separator = chr(code)
+        joined = separator.join(values)
+        if joined.count(separator) == len(values) - 1:
+            data = np.frombuffer(joined.encode('utf-8'), dtype=np.uint8)
+            return data, data == code, separator
+    return None
+
+def split_values(data, separator):
+    return data.tobytes().decode('utf-8').split(separator)
+
+def _mask_bytes(values, kernel):
+    joined = join_values(values)
+    if joined is None:
+        return [_mask_bytes([value], kernel)[0] for value in values]
+    data, sep, separator = joined
+    masked = kernel(data) & ~sep
+    out = data.copy()
+    # Kernels only select ASCII bytes, so multi-byte characters are never split
+    np.putmask(out, masked, ord(MASK_CHAR))
+    return split_values(out, separator)
+
+def _bytewise(kernel):
+    def policy(series, keep):
+        column = _arrow_column(series)
+        if column is not None:
+            # Kernels only select ASCII bytes, so non-ASCII data is fine here
+            array, _, _ = column
+            _, _, buffer = array.buffers()
+            if buffer is None:
+                return series.copy()
+            data = np.frombuffer(buffer, dtype=np.uint8)
+            out = data.copy()
+            np.putmask(out, kernel(data), ord(MASK_CHAR))
+            return _with_data(series, array, out)
+        values = series.tolist()
+        masked = []
+        for start in range(0, len(values), BLOCK_SIZE):
+            masked.extend(_mask_bytes(values[start:start + BLOCK_SIZE], kernel))
+        return pd.Series(masked, index=series.index, dtype=str)
+    return policy
+
+MASK_POLICIES = {
+    'full': _full,
+    'keep_last': _keep_last,
+    'email_domain': _email_domain,
+    'phone': _bytewise(_phone),
+    'digits': _bytewise(_digits),
+}
+
+def parse_mask_mode(mode):
+    """
+    Split a column mode such as 'mask' or 'mask:email_domain' into its policy.
+
+    Returns:
+        str: The policy name, or None if the mode is not a mask mode
+    """
+    name, _, policy = (mode or '').partition(':')
+    if name != 'mask':
+        return None
+    return policy or 'full'
+
+def mask_series(series, policy='full', keep=4):
+    """
+    Mask a column with a vectorized kernel.
+
+    Args:
+        series (Series): Column values
+        policy (str): One of MASK_POLICIES
+        keep (int): Trailing characters left visible by 'keep_last'
+
+    Returns:
+        Series: The masked values
+
+    Raises:
+        Exception: If the policy is unknown
+    """
+    if policy not in MASK_POLICIES:
+        raise Exception(f"Unknown mask policy: {policy}. Expected one of {', '.join(MASK_POLICIES)}")
+    masked = MASK_POLICIES[policy](series.astype(str), max(int(keep), 0))
+    return masked.rename(series.name)
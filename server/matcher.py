@@ -0,0 +1,78 @@
+from collections import deque
+
+class Matcher:
+    """
+    Aho-Corasick automaton over a fixed set of literal patterns.
+
+    Built once per document, it finds every occurrence of every pattern in a
+    single pass over a text, in time linear in the text plus the matches,
+    however many patterns there are.
+    """
+
+    def __init__(self, patterns):
+        self.patterns = sorted({pattern for pattern in patterns if pattern})
+        # Per state: outgoing edges, failure link, length of the pattern
+        # ending exactly here (0 if none) and the nearest state down the
+        # failure chain that ends a pattern
+        self._goto = [{}]
+        self._fail = [0]
+        self._length = [0]
+        self._output = [0]
+        for pattern in self.patterns:
+            state = 0
+            for char in pattern:
+                if char not in self._goto[state]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._length.append(0)
+                    self._output.append(0)
+                    self._goto[state][char] = len(self._goto) - 1
+                state = self._goto[state][char]
+            self._length[state] = len(pattern)
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self._goto[state].items():
+                queue.append(child)
+                if state:
+                    fail = self._fail[state]
+                    while fail and char not in self._goto[fail]:
+                        fail = self._fail[fail]
+                    self._fail[child] = self._goto[fail].get(char, 0)
+                link = self._fail[child]
+                self._output[child] = link if self._length[link] else self._output[link]
+
+    def finditer(self, text):
+        """
+        Find the leftmost-longest, non-overlapping occurrences in text.
+
+        Scanning left to right, a match starting earlier always wins, and of
+        the matches starting at the same place the longest wins, so a value
+        that contains another value is matched whole.
+
+        Returns:
+            list: (start, end) spans in text, in order
+        """
+        goto, fail, length, output = self._goto, self._fail, self._length, self._output
+        # Start -> end of the longest pattern starting there
+        longest = {}
+        state = 0
+        for end, char in enumerate(text, 1):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            match = state if length[state] else output[state]
+            while match:
+                start = end - length[match]
+                if longest.get(start, 0) < end:
+                    longest[start] = end
+                match = output[match]
+
+        spans = []
+        last = 0
+        for start in sorted(longest):
+            if start >= last:
+                spans.append((start, longest[start]))
+                last = longest[start]
+        return spans
@@ -0,0 +1,107 @@
+from concurrent.futures import ThreadPoolExecutor
+from chat import chatrows
+from pseudonymize import DEFAULT_SECRET
+import hashlib
+import hmac
+import os
+import numpy as np
+import pandas as pd
+
+BATCH_SIZE = 50
+CONCURRENCY = 4
+RETRIES = 2
+
+def _obfuscate_batch(prompt, batch, retries, chat):
+    # Only the values still missing are re-sent, so a short or failed response
+    # costs one more call for this batch and nothing for the rest of the column
+    ids = {str(key): key for key in batch}
+    pending = {str(key): value for key, value in batch.items()}
+    result = {}
+    for attempt in range(retries + 1):
+        try:
+            response = chat(prompt, pending)
+        except Exception as e:
+            print(f"Obfuscation batch failed on attempt {attempt + 1}: {str(e)}")
+            continue
+        for row_id, value in response.items():
+            if row_id in pending:
+                result[ids[row_id]] = value
+                del pending[row_id]
+        if not pending:
+            return result
+        print(f"Obfuscation batch came back {len(pending)} values short on attempt {attempt + 1}")
+    raise Exception(f"Could not obfuscate {len(pending)} values after {retries + 1} attempts")
+
+def obfuscate_values(values, prompt, batch_size=BATCH_SIZE, concurrency=CONCURRENCY, retries=RETRIES, chat=chatrows):
+    """
+    Obfuscate a list of values through the LLM in keyed batches sent concurrently.
+
+    Args:
+        values (list): Values to obfuscate
+        prompt (str): The column's obfuscation instruction
+        batch_size (int): Values per request
+        concurrency (int): Requests in flight at once
+        retries (int): Extra attempts for a batch that fails or comes back short
+        chat (callable): chat(prompt, {id: value}) -> {id: value}
+
+    Returns:
+        list: The obfuscated values, in the order given
+
+    Raises:
+        Exception: If a batch still has missing values after its retries
+    """
+    batches = [
+        {key: values[key] for key in range(start, min(start + batch_size, len(values)))}
+        for start in range(0, len(values), batch_size)
+    ]
+    result = {}
+    with ThreadPoolExecutor(max_workers=max(int(concurrency), 1)) as pool:
+        futures = [pool.submit(_obfuscate_batch, prompt, batch, retries, chat) for batch in batches]
+        for future in futures:
+            result.update(future.result())
+    # Reassembled by key, never by position in the response
+    return [result[key] for key in range(len(values))]
+
+def mapping_keys(values, secret=None):
+    """
+    Keyed hashes that stand in for original values in a mapping.
+
+    Mappings are saved with incremental checkpoints, so they never hold the
+    originals themselves: an HMAC-SHA256 of the value under the request's
+    secret (or $FIDELIUS_SECRET) finds the replacement just as well.
+
+    Returns:
+        list: One hex digest per value
+    """
+    key = (secret or os.environ.get('FIDELIUS_SECRET', DEFAULT_SECRET)).encode('utf-8')
+    return [hmac.new(key, value.encode('utf-8'), hashlib.sha256).hexdigest() for value in values]
+
+def obfuscate_series(series, prompt, mapping=None, secret=None, **kwargs):
+    """
+    Obfuscate a column, sending each distinct value to the LLM only once.
+
+    Args:
+        series (Series): Column values
+        prompt (str): The column's obfuscation instruction
+        mapping (dict): mapping_keys(original) -> replacement values already
+            known for this column. Values found here are not sent again and new
+            ones are added, so passing the same dict for every chunk keeps
+            replacements consistent across the whole file.
+        secret (str): Key for mapping_keys
+        **kwargs: batch_size, concurrency, retries and chat for obfuscate_values
+
+    Returns:
+        Series: The obfuscated values, aligned to series.index
+    """
+    if mapping is None:
+        mapping = {}
+    codes, uniques = pd.factorize(series.astype(str))
+    keys = mapping_keys(uniques, secret)
+    missing = [index for index, key in enumerate(keys) if key not in mapping]
+    if missing:
+        print(f"Obfuscating {len(missing)} distinct values of {len(series)} rows")
+        replaced = obfuscate_values([uniques[index] for index in missing], prompt, **kwargs)
+        mapping.update(zip((keys[index] for index in missing), replaced))
+    # Vectorized lookup; the trailing '' is where missing values (code -1) land
+    replacements = np.array([mapping[key] for key in keys] + [''], dtype=object)
+    return pd.Series(replacements[codes], index=series.index, name=series.name, dtype=str)
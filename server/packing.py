@@ -0,0 +1,120 @@
+import math
+
+# Page text sent per LLM request, in estimated tokens
+TOKEN_BUDGET = 2000
+# Rough size of a token for English text; close enough for budgeting
+CHARS_PER_TOKEN = 4
+# Placed between the pieces of a batch
+SEPARATOR = '\n\n'
+# Tried in order when a page has to be cut into pieces
+SPLIT_POINTS = ['\n\n', '\n', ' ']
+
+def estimate_tokens(text):
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+def _split(text, start, end, limit, points=SPLIT_POINTS):
+    # (start, end) pieces of text[start:end], each at most limit characters,
+    # cut at the coarsest boundary that makes them fit
+    if end - start <= limit:
+        return [(start, end)]
+    if not points:
+        return [(i, min(i + limit, end)) for i in range(start, end, limit)]
+    point, rest = points[0], points[1:]
+    pieces = []
+    piece_start = piece_end = start
+    while piece_end < end:
+        found = text.find(point, piece_end, end)
+        boundary = end if found == -1 else found + len(point)
+        if boundary - piece_end > limit:
+            # One paragraph (or line) alone is too big: cut it finer
+            if piece_end > piece_start:
+                pieces.append((piece_start, piece_end))
+            pieces.extend(_split(text, piece_end, boundary, limit, rest))
+            piece_start = boundary
+        elif boundary - piece_start > limit:
+            pieces.append((piece_start, piece_end))
+            piece_start = piece_end
+        piece_end = boundary
+    if piece_end > piece_start:
+        pieces.append((piece_start, piece_end))
+    return pieces
+
+def pack_pages(pages, budget=TOKEN_BUDGET):
+    """
+    Group page text into LLM requests that fill a token budget.
+
+    Consecutive pages share a request while they fit; a page larger than the
+    budget is cut at paragraph, then line, then word boundaries. Batches are
+    yielded as soon as they are full, so pages can be fed in as they are
+    extracted.
+
+    Args:
+        pages (iterable): (page number, text) in page order
+        budget (int): Estimated tokens of page text per request
+
+    Yields:
+        dict: 'text' to send, and 'segments', one per piece of a page in it,
+            with the piece's 'page', its 'start' and 'end' offsets in the page
+            text, its 'offset' in the batch text, and 'last' when it is the
+            page's final piece
+    """
+    limit = budget * CHARS_PER_TOKEN
+    text = ''
+    segments = []
+    for page_num, page_text in pages:
+        if not page_text.strip():
+            continue
+        pieces = _split(page_text, 0, len(page_text), limit)
+        for i, (start, end) in enumerate(pieces):
+            joined = len(text) + len(SEPARATOR) if segments else 0
+            if segments and joined + end - start > limit:
+                yield {'text': text, 'segments': segments}
+                text, segments, joined = '', [], 0
+            text = text + SEPARATOR + page_text[start:end] if segments else page_text[start:end]
+            segments.append({
+                'page': page_num, 'start': start, 'end': end,
+                'offset': joined, 'last': i == len(pieces) - 1,
+            })
+    if segments:
+        yield {'text': text, 'segments': segments}
+
+def locate(batch, position):
+    """
+    Map an offset in a batch's text back to the page it came from.
+
+    Returns:
+        tuple: (page number, offset in that page's text), or None if the
+            position falls on a separator
+    """
+    for segment in batch['segments']:
+        relative = position - segment['offset']
+        if 0 <= relative < segment['end'] - segment['start']:
+            return segment['page'], segment['start'] + relative
+    return None
+
+def find_values(batch, items):
+    """
+    Find where each detected value occurs in a batch.
+
+    Args:
+        batch (dict): A batch from pack_pages
+        items (list): (key, values) pairs detected in it
+
+    Returns:
+        list: (key, value, page, start, end) for every occurrence, with start
+            and end offsets in the page text
+    """
+    found = []
+    for key, values in items:
+        for value in values:
+            if not value:
+                continue
+            position = batch['text'].find(value)
+            while position != -1:
+                location = locate(batch, position)
+                # Skip matches that run across a separator into the next piece
+                if location and locate(batch, position + len(value) - 1) == (location[0], location[1] + len(value) - 1):
+                    page_num, start = location
+                    found.append((key, value, page_num, start, start + len(value)))
+                position = batch['text'].find(value, position + 1)
+    return found
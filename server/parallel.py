@@ -0,0 +1,108 @@
+import io
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from incremental import BoundedReader, BLOCK_BYTES
+
+SHARD_CHUNK_SIZE = 100000
+
+def record_boundaries(path, targets):
+    """
+    Map byte offsets to the CSV record boundaries at or after them.
+
+    A boundary is the position just past a newline that sits outside quotes,
+    so quoted fields containing newlines are never split. Quote parity is
+    tracked over the whole file with NumPy, one block at a time.
+
+    Args:
+        path (str): CSV file
+        targets (list): Byte offsets, ascending
+
+    Returns:
+        list: One boundary per target, or the file size if none follows it
+    """
+    size = os.path.getsize(path)
+    boundaries = []
+    pending = list(targets)
+    parity = 0
+    position = 0
+    with open(path, 'rb') as file:
+        while pending:
+            block = file.read(BLOCK_BYTES)
+            if not block:
+                break
+            data = np.frombuffer(block, dtype=np.uint8)
+            quotes = (np.cumsum(data == ord('"')) + parity) % 2
+            ends = position + np.flatnonzero((data == ord('\n')) & (quotes == 0)) + 1
+            while pending and len(ends):
+                index = np.searchsorted(ends, pending[0])
+                if index == len(ends):
+                    break
+                boundaries.append(int(ends[index]))
+                pending.pop(0)
+            parity = int(quotes[-1])
+            position += len(block)
+    return boundaries + [size] * len(pending)
+
+def _process_shard(input_path, start, end, columns, shard_path, plan, plan_kwargs):
+    rows = 0
+    with open(shard_path, 'w', newline='') as out:
+        if end > start:
+            with io.BufferedReader(BoundedReader(input_path, start, end)) as source:
+                reader = pd.read_csv(
+                    source, header=None, names=columns, chunksize=SHARD_CHUNK_SIZE,
+                    dtype=str, keep_default_na=False, na_filter=False
+                )
+                for chunk in reader:
+                    plan(chunk, **plan_kwargs).to_csv(out, index=False, header=False)
+                    rows += len(chunk)
+    return rows
+
+def run_sharded(input_path, output_file, workers, plan, plan_kwargs):
+    """
+    Transform a CSV on a process pool, one row range per worker.
+
+    The file is split at record boundaries into one shard per worker, each
+    shard is transformed and written by its own process, and the shard
+    outputs are concatenated in order, so the result is byte-identical to
+    running the plan serially.
+
+    Args:
+        input_path (str): CSV input
+        output_file (str): CSV output
+        workers (int): Processes to use
+        plan (callable): Module-level plan(frame, **plan_kwargs) -> frame
+        plan_kwargs (dict): Picklable keyword arguments for plan
+
+    Returns:
+        int: Rows processed
+    """
+    header_end = record_boundaries(input_path, [0])[0]
+    columns = pd.read_csv(input_path, nrows=0).columns.tolist()
+    size = os.path.getsize(input_path)
+    step = max((size - header_end) // workers, 1)
+    targets = [header_end + step * i for i in range(1, workers)]
+    starts = [header_end] + record_boundaries(input_path, targets)
+    ends = starts[1:] + [size]
+
+    shard_dir = tempfile.mkdtemp(prefix='shards-', dir=os.path.dirname(os.path.abspath(output_file)))
+    try:
+        shard_paths = [os.path.join(shard_dir, f"{i}.csv") for i in range(workers)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(_process_shard, input_path, start, end, columns, shard_path, plan, plan_kwargs)
+                for start, end, shard_path in zip(starts, ends, shard_paths)
+            ]
+            rows = sum(future.result() for future in futures)
+        with open(output_file, 'w', newline='') as out:
+            pd.DataFrame(columns=columns).to_csv(out, index=False)
+            for shard_path in shard_paths:
+                with open(shard_path, 'r', newline='') as shard:
+                    shutil.copyfileobj(shard, out)
+    finally:
+        shutil.rmtree(shard_dir, ignore_errors=True)
+    print(f"Processed {rows} rows on {workers} workers")
+    return rows
@@ -2,98 +2,321 @@ from chat import chatlocal
 import csv
 import pandas as pd
 import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import PyPDF2
-data_dict = {}
-def predictpdfheaders(filename):
-    # Create the full file path using the script's location
-    print(filename)
-    filepath = filename
-    
-    # Dictionary to hold PII data for each type (dynamically discovered)
-    pii_items = []
-    # Open the PDF file
+from packing import pack_pages, find_values, estimate_tokens, TOKEN_BUDGET
+from sessions import SessionStore, file_hash
+from diskcache import DiskCache
+from matcher import Matcher
+from pdfredact import redact_pdf
+from boilerplate import split_boilerplate, unit_to_pages
+from pdfocr import ocr_pages, needs_ocr, OCR_DPI
+
+# LLM requests in flight at once while detecting PII
+PAGE_CONCURRENCY = 4
+# Extraction ranges per worker; more than one keeps the progress counter moving
+RANGES_PER_WORKER = 4
+
+DETECT_PROMPT = "You are a tool to identify types of PII data in a pdf text document. Return only a list of all the types of PII present. example Name: Mustafa Abdul \n Address: 2201 C Street NW \n Phone No.: 202-555-0129"
+DETECT_SUFFIX = "from this text identify all the types of PII data present eg. email, phone number, name, address etc. Do not return any other text or values."
+
+# Content hash -> {'entities': PII type -> values, 'locations': PII type ->
+# (value, page, start, end) in the page text, 'boxes': PII type -> (page,
+# [x0, y0, x1, y1]) on OCR'd pages, 'pages': page texts, 'offsets':
+# where each page starts in the pages joined by newlines, 'runs': text runs
+# per page from _extract_page}
+sessions = SessionStore()
+# Bump when extraction changes, so cached layouts from older code are not reused
+PARSER_VERSION = f"pypdf2-{PyPDF2.__version__}-1"
+# Content hash and parser version -> per page 'text' and 'runs', shared by
+# detection, masking and any later re-run on the same file
+layout_cache = DiskCache('pdf')
+
+MAX_PROGRESS = 256
+# file path -> progress counters, read by /getpdfprogress and kept after
+# detection returns for its report; bounded like the sessions
+_progress = SessionStore(max_entries=MAX_PROGRESS)
+_progress_lock = threading.Lock()
+
+def _advance(progress, stage, count=1):
+    with _progress_lock:
+        progress[stage] += count
+
+def pdfprogress(filepath):
+    """
+    Report how far PII detection has got on a PDF.
+
+    Returns:
+        dict: 'pages' in the document, pages 'extracted', pages 'detected',
+            LLM 'requests' sent, estimated 'tokens' of text to detect on and
+            'tokens_saved' by sending repeated blocks once, with 'reused'
+            set when an earlier detection of the same content was returned,
+            or None if the file has not been submitted recently
+    """
+    progress = _progress.get(filepath)
+    with _progress_lock:
+        return dict(progress) if progress else None
+
+def _extract_page(page):
+    # Page text plus the text runs it is made of: [offset in the text,
+    # length, x, y, font size] in PDF user space, for locating values later.
+    # PyPDF2 reports a run's matrices when it flushes the run, so positions
+    # are close to the run's origin rather than exact per glyph
+    runs = []
+    parts = []
+    position = 0
+    def visit(text, cm, tm, font, size):
+        nonlocal position
+        if text:
+            if text.strip():
+                x = tm[4] * cm[0] + tm[5] * cm[2] + cm[4]
+                y = tm[4] * cm[1] + tm[5] * cm[3] + cm[5]
+                scale = abs(tm[3] * cm[3]) or abs(tm[0] * cm[0]) or 1
+                runs.append([position, len(text), round(x, 2), round(y, 2), round(size * scale, 2)])
+            parts.append(text)
+            position += len(text)
+    page.extract_text(visitor_text=visit)
+    return {'text': ''.join(parts), 'runs': runs}
+
+def _extract_range(filepath, start, stop):
+    # Runs in a worker process, which opens the file itself so only the path
+    # and the extracted pages cross the process boundary
     with open(filepath, 'rb') as file:
         reader = PyPDF2.PdfReader(file)
-        num_pages = len(reader.pages)
-
-        # Process each page
-        for page_num in range(num_pages):
-            page = reader.pages[page_num]
-            text = page.extract_text()
-            print(text)     
-            systemprompt="You are a tool to identify types of PII data in a pdf text document. Return only a list of all the types of PII present. example Name: Mustafa Abdul \n Address: 2201 C Street NW \n Phone No.: 202-555-0129"
-            # Send text to chatlocal() to identify PII data
-            detected_pii = chatlocal(systemprompt,text + "from this text identify all the types of PII data present eg. email, phone number, name, address etc. Do not return any other text or values.")
-            print(detected_pii)
-            lines = detected_pii.strip().split('\n')
-            # Split the returned PII string by common delimiters (spaces, newlines, commas)
-            for line in lines:
-                # Split each line by the colon and strip whitespace
-                key, value = line.split(':', 1)
-                
-                key = key.strip()
-                value = value.strip()
-
-                # Split multiple values by commas and strip whitespace from each value
-                values = [v.strip() for v in value.split(',')]
-
-                # Check if the key already exists in the dictionary
-                if key in data_dict:
-                    data_dict[key].extend(values)  # Append new values to the existing list
-                else:
-                    data_dict[key] = values  # Create a new list for the key
-
-            # Extracting only the text before the colon (key names) for display
-            pii_items = [line.split(':')[0].strip() for line in lines]
-    print(data_dict)
-    return [' ']+pii_items
-
-from PyPDF2 import PdfReader, PdfWriter
+        return [_extract_page(reader.pages[page_num]) for page_num in range(start, stop)]
+
+def parse_pii(detected):
+    """
+    Parse the LLM's 'Key: value, value' answer into a list of (key, values).
+
+    Items are split on newlines and commas. An item without a colon is one
+    more value for the key before it on the same line; a line that starts
+    without a key is skipped instead of failing the whole document.
+    """
+    items = []
+    for line in detected.split('\n'):
+        current = None
+        for token in line.split(','):
+            if ':' in token:
+                key, token = token.split(':', 1)
+                key = key.strip(' -*\t')
+                current = (key, []) if key else None
+                if current:
+                    items.append(current)
+            token = token.strip()
+            if token and current:
+                current[1].append(token)
+    return items
+
+def _pages(filepath, ranges, workers, progress):
+    # (page number, extracted page) in page order; with several workers the
+    # ranges are extracted on a process pool
+    if workers == 1:
+        extracted = ((start, _extract_range(filepath, start, stop)) for start, stop in ranges)
+        for start, pages in extracted:
+            _advance(progress, 'extracted', len(pages))
+            yield from enumerate(pages, start)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [(start, pool.submit(_extract_range, filepath, start, stop)) for start, stop in ranges]
+        for start, future in futures:
+            pages = future.result()
+            _advance(progress, 'extracted', len(pages))
+            yield from enumerate(pages, start)
+
+def _detect_batch(progress, batch, units, pending):
+    detected = chatlocal(DETECT_PROMPT, batch['text'] + DETECT_SUFFIX)
+    items = parse_pii(detected)
+    # A page is detected once every unit it is made of has been
+    done = 0
+    with _progress_lock:
+        for segment in batch['segments']:
+            if segment['last']:
+                for page_num, _ in units[segment['page']]['places']:
+                    pending[page_num] -= 1
+                    done += pending[page_num] == 0
+        progress['detected'] += done
+    found = []
+    for name, value, unit, start, end in find_values(batch, items):
+        for page_num, page_start, page_end in unit_to_pages(units[unit], start, end):
+            found.append((name, value, page_num, page_start, page_end))
+    return items, found
+
+def predictpdfheaders(filename, workers=None, concurrency=PAGE_CONCURRENCY, budget=TOKEN_BUDGET, dedupe=True, ocr=True, dpi=OCR_DPI):
+    """
+    Detect the types of PII in a PDF.
+
+    Page text is extracted on a process pool, one page range per task.
+    Headers, footers and other blocks repeated across pages are split out
+    and detected once for all the pages they are on. The remaining text is
+    packed into requests of about `budget` tokens: short pages share a
+    request, long ones are split at paragraph boundaries. Up to
+    `concurrency` requests are in flight at once, and results are merged in
+    page order. The result is kept in the session store under the file's
+    content hash, so masking the same document does not parse or detect it
+    again, and the page text and layout also go to an on-disk cache, so a
+    later run on the same file skips extraction. Pages with no text layer
+    are rendered and OCR'd on a separate process pool while the LLM
+    requests run, and the PII types found on them are added with their
+    boxes in PDF coordinates.
+
+    Args:
+        filename (str): Path to the PDF
+        workers (int): Extraction processes, defaults to the CPU count
+        concurrency (int): LLM requests in flight at once
+        budget (int): Estimated tokens of page text per request
+        dedupe (bool): Detect repeated blocks once instead of on every page
+        ocr (bool): OCR pages without a text layer through the image analyzer
+        dpi (int): Resolution pages are rendered at for OCR
+
+    Returns:
+        list: ' ' followed by the PII types found, in order of first appearance
+    """
+    filepath = filename
+    print(filepath)
+    key = file_hash(filepath)
+    session = sessions.get(key)
+    if session is not None:
+        print(f"Reusing detection for {filepath}")
+        _progress.put(filepath, dict(session['report'], requests=0, reused=True))
+        return [' ']+list(session['entities'])
+
+    layout_key = f"{key}-{PARSER_VERSION}"
+    pages = layout_cache.get(layout_key)
+    if pages is not None:
+        print(f"Read page text and layout of {filepath} from the cache")
+        num_pages = len(pages)
+        progress = {'pages': num_pages, 'extracted': num_pages, 'detected': 0, 'requests': 0}
+        _progress.put(filepath, progress)
+    else:
+        with open(filepath, 'rb') as file:
+            num_pages = len(PyPDF2.PdfReader(file).pages)
+        workers = max(1, min(workers or os.cpu_count() or 1, num_pages))
+        progress = {'pages': num_pages, 'extracted': 0, 'detected': 0, 'requests': 0}
+        _progress.put(filepath, progress)
+        step = max(1, -(-num_pages // (workers * RANGES_PER_WORKER)))
+        ranges = [(start, min(start + step, num_pages)) for start in range(0, num_pages, step)]
+        pages = [page for _, page in _pages(filepath, ranges, workers, progress)]
+        layout_cache.put(layout_key, pages)
+
+    texts = [page['text'] for page in pages]
+    if dedupe:
+        units = split_boilerplate(texts)
+    else:
+        units = [{'text': text, 'places': [(page_num, [(0, 0, len(text))])]} for page_num, text in enumerate(texts) if text.strip()]
+    pending = [0] * num_pages
+    for unit in units:
+        for page_num, _ in unit['places']:
+            pending[page_num] += 1
+    page_tokens = sum(estimate_tokens(text) for text in texts)
+    unit_tokens = sum(estimate_tokens(unit['text']) for unit in units)
+    with _progress_lock:
+        # Pages without text never reach the LLM
+        progress['detected'] += pending.count(0)
+        progress['tokens'] = unit_tokens
+        progress['tokens_saved'] = page_tokens - unit_tokens
+    print(f"Boilerplate removal saved ~{page_tokens - unit_tokens} of {page_tokens} page text tokens")
+
+    scanned = [page_num for page_num, text in enumerate(texts) if needs_ocr(text)] if ocr else []
+    with _progress_lock:
+        progress['scanned'] = len(scanned)
+        progress['ocr'] = 0
+
+    prompt_tokens = 0
+    with ThreadPoolExecutor(max_workers=concurrency) as llm, ThreadPoolExecutor(max_workers=1) as ocr_runner:
+        scanning = ocr_runner.submit(
+            ocr_pages, filepath, scanned, dpi, workers, lambda: _advance(progress, 'ocr')
+        ) if scanned else None
+        detections = []
+        for batch in pack_pages(((i, unit['text']) for i, unit in enumerate(units)), budget):
+            detections.append(llm.submit(_detect_batch, progress, batch, units, pending))
+            _advance(progress, 'requests')
+            prompt_tokens += estimate_tokens(DETECT_PROMPT + batch['text'] + DETECT_SUFFIX)
+        results = [future.result() for future in detections]
+        scanned_results = {}
+        if scanning:
+            try:
+                scanned_results = scanning.result()
+            except Exception as e:
+                print(f"Could not OCR {len(scanned)} pages without text: {str(e)}")
+    print(f"Detected PII on {num_pages} pages in {len(results)} requests (~{prompt_tokens} prompt tokens)")
+
+    entities = {}
+    locations = {}
+    for items, found in results:
+        for name, values in items:
+            known = entities.setdefault(name, [])
+            known.extend(value for value in values if value not in known)
+        for name, value, page_num, start, end in found:
+            locations.setdefault(name, []).append((value, page_num, start, end))
+    # OCR hits have boxes rather than text offsets
+    boxes = {}
+    for page_num in sorted(scanned_results):
+        for result in scanned_results[page_num]:
+            entities.setdefault(result['entity_type'], [])
+            boxes.setdefault(result['entity_type'], []).append((page_num, result['box']))
+    offsets = []
+    position = 0
+    for page in pages:
+        offsets.append(position)
+        position += len(page['text']) + 1
+    sessions.put(key, {
+        'entities': entities, 'locations': locations, 'boxes': boxes, 'offsets': offsets,
+        'pages': texts, 'runs': [page['runs'] for page in pages], 'report': dict(progress),
+    })
+    print(entities)
+    return [' ']+list(entities)
+
+def _pdf_path(json_data):
+    if json_data.get('filePath'):
+        return json_data['filePath']
+    folder = json_data.get('inputPath') or os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(folder, json_data['fileName'])
+
 def maskobfpdf(json_data):
-    filepath=os.path.dirname(os.path.abspath(__file__))+"\\"+json_data['fileName']
-    modified_dict = {}
-    reader = PdfReader(filepath)
-    writer = PdfWriter()
-    modified_value = ""
-    # Loop through each header in the input
+    filepath = _pdf_path(json_data)
+    key = file_hash(filepath)
+    session = sessions.get(key)
+    if session is None:
+        # Evicted or never detected: detect once, then use that session
+        print(f"No detection session for {filepath}, detecting PII first")
+        predictpdfheaders(filepath)
+        session = sessions.get(key)
+
+    # Values to remove, across all selected PII types. Fonts in a PDF are
+    # usually subsets, so replacement text cannot be drawn: masking and
+    # obfuscating both leave the values blank
+    selected = set()
+    # Page -> boxes to paint over on OCR'd pages
+    page_boxes = {}
     for field in json_data['headers']:
         name = field['name']
         mode = field['mode']
-        prompt = field.get('prompt', "")
-        
-        # Get the original value from the provided data dictionary
-        original_value = data_dict.get(name, "")
-        
-        # Pass the value through the chatlocal() function to modify it
-        if mode=='obfuscate':
-            systemprompt="You are a tool that can modify the following data. Return the modified comma seperated values only and no other texts or information."
-            modified_value = chatlocal(systemprompt,original_value+prompt)
-            print(modified_value)
-        elif mode=='mask':
-            modified_value = "#" * len(original_value)
-
-        # Store the modified value in a new dictionary
-        modified_dict[name] = modified_value
-
-    #Replace the original values in PDF with modified values
-    # Process each page of the PDF
-    for page_num in range(len(reader.pages)):
-        page = reader.pages[page_num]
-        text = page.extract_text()
-        
-        # Replace original values with modified ones in the text
-        for name, modified_value in modified_dict.items():
-            text = text.replace(data_dict.get(name, ""), modified_value)
-            print(text)
-        # Add modified text back to the page (currently PyPDF2 doesn’t support text re-insertion)
-        # You would need a more advanced library like `pdfplumber` for this or use annotations
-        
-        # For now, just add the original page to the writer
-        writer.add_page(page)
-
-    # Save the modified PDF to a new file
-    modified_pdf_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "modified_" + os.path.basename(filepath))
-    with open(modified_pdf_path, "wb") as output_pdf:
-        writer.write(output_pdf)
+        if mode not in ('mask', 'obfuscate'):
+            continue
+
+        for page_num, box in session['boxes'].get(name, []):
+            page_boxes.setdefault(page_num, []).append(box)
+        # Values detected for this type in this document only
+        selected.update(session['entities'].get(name, []))
+        if mode == 'obfuscate':
+            print(f"Obfuscating {name} in a PDF removes the values, as masking does")
+
+    # Find the values on each page of the text kept by detection, in one pass
+    # per page; where values overlap the longest one wins
+    matcher = Matcher(selected)
+    page_values = {}
+    for page_num, text in enumerate(session['pages']):
+        spans = matcher.finditer(text)
+        if spans:
+            page_values[page_num] = {text[start:end] for start, end in spans}
+    print(f"Found selected values on {len(page_values)} of {len(session['pages'])} pages")
+
+    # Remove them from the pages' content streams
+    output_dir = json_data.get('outputPath') or os.path.dirname(os.path.abspath(__file__))
+    modified_pdf_path = os.path.join(output_dir, "modified_" + os.path.basename(filepath))
+    removed = redact_pdf(filepath, modified_pdf_path, page_values, page_boxes, json_data.get('dpi', OCR_DPI))
+    print(f"Removed {removed} glyphs")
 
     return modified_pdf_path
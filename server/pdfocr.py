@@ -0,0 +1,139 @@
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from PIL import ImageDraw
+import PyPDF2
+
+OCR_DPI = 200
+# Pages whose text layer has fewer non-space characters than this are OCR'd
+MIN_TEXT_CHARS = 1
+REDACT_FILL = (0, 0, 0)
+
+def _pdf2image():
+    try:
+        import pdf2image
+    except ImportError:
+        raise Exception("OCR of scanned PDF pages needs pdf2image and poppler: pip install pdf2image")
+    return pdf2image
+
+def needs_ocr(text):
+    return len(''.join(text.split())) < MIN_TEXT_CHARS
+
+def page_geometry(page):
+    """Media box (left, bottom, right, top) in points and the page's /Rotate."""
+    box = page.mediabox
+    return [float(box.left), float(box.bottom), float(box.right), float(box.top)], int(page.get('/Rotate', 0)) % 360
+
+def _to_pdf(geometry, dx, dy):
+    # Point in the rendered page, in points from its top-left corner, to PDF
+    # user space; the renderer has already applied /Rotate
+    (left, bottom, right, top), rotate = geometry
+    if rotate == 90:
+        return left + dy, bottom + dx
+    if rotate == 180:
+        return right - dx, bottom + dy
+    if rotate == 270:
+        return right - dy, top - dx
+    return left + dx, top - dy
+
+def _to_rendered(geometry, x, y):
+    (left, bottom, right, top), rotate = geometry
+    if rotate == 90:
+        return y - bottom, x - left
+    if rotate == 180:
+        return right - x, y - bottom
+    if rotate == 270:
+        return top - y, right - x
+    return x - left, top - y
+
+def pixels_to_pdf(geometry, dpi, left, top, width, height):
+    """Map a pixel box of a page rendered at dpi to [x0, y0, x1, y1] in points."""
+    scale = 72 / dpi
+    corners = [_to_pdf(geometry, x * scale, y * scale) for x, y in ((left, top), (left + width, top + height))]
+    xs, ys = zip(*corners)
+    return [round(min(xs), 2), round(min(ys), 2), round(max(xs), 2), round(max(ys), 2)]
+
+def pdf_to_pixels(geometry, dpi, box):
+    """Map [x0, y0, x1, y1] in points to a pixel box of the page rendered at dpi."""
+    scale = dpi / 72
+    corners = [_to_rendered(geometry, x, y) for x, y in ((box[0], box[1]), (box[2], box[3]))]
+    xs, ys = zip(*corners)
+    return [min(xs) * scale, min(ys) * scale, max(xs) * scale, max(ys) * scale]
+
+def render_page(filepath, page_num, dpi=OCR_DPI):
+    images = _pdf2image().convert_from_path(filepath, dpi=dpi, first_page=page_num + 1, last_page=page_num + 1)
+    return images[0]
+
+def _ocr_page(filepath, page_num, geometry, dpi):
+    # Runs in a worker process: render one page and analyze it the same way
+    # imagehandler.predict_image_entities analyzes an image file, with the
+    # worker's own shared analyzer
+    from imagehandler import analyze_image
+    image = render_page(filepath, page_num, dpi)
+    results = analyze_image(image)['results']
+    return [
+        {
+            'entity_type': result['entity_type'],
+            'score': result['score'],
+            'box': pixels_to_pdf(geometry, dpi, result['left'], result['top'], result['width'], result['height']),
+        }
+        for result in results
+    ]
+
+def ocr_pages(filepath, page_nums, dpi=OCR_DPI, workers=None, progress=None):
+    """
+    OCR and analyze pages that have no text layer, in parallel.
+
+    Each page is rendered at dpi in a worker process and run through the
+    image PII analyzer; detected boxes are mapped back to PDF user space.
+
+    Args:
+        filepath (str): The PDF
+        page_nums (list): Pages to OCR
+        dpi (int): Render resolution
+        workers (int): Processes, defaults to the CPU count
+        progress (callable): Called with no arguments as each page finishes
+
+    Returns:
+        dict: Page number -> list of {'entity_type', 'score', 'box'}, where
+            box is [x0, y0, x1, y1] in points
+    """
+    _pdf2image()
+    if not page_nums:
+        return {}
+    with open(filepath, 'rb') as file:
+        reader = PyPDF2.PdfReader(file)
+        geometries = {page_num: page_geometry(reader.pages[page_num]) for page_num in page_nums}
+    workers = max(1, min(workers or os.cpu_count() or 1, len(page_nums)))
+    found = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(_ocr_page, filepath, page_num, geometries[page_num], dpi): page_num
+            for page_num in page_nums
+        }
+        for future in as_completed(futures):
+            found[futures[future]] = future.result()
+            if progress:
+                progress()
+    return found
+
+def redact_scanned_page(filepath, page_num, boxes, dpi=OCR_DPI, fill=REDACT_FILL):
+    """
+    Render a page, paint over the boxes and return it as a one-page PDF page.
+
+    The whole page is replaced by the painted raster, so the original image
+    under a box does not survive in the output.
+
+    Returns:
+        PageObject: The replacement page, the same size as the original
+    """
+    with open(filepath, 'rb') as file:
+        geometry = page_geometry(PyPDF2.PdfReader(file).pages[page_num])
+    image = render_page(filepath, page_num, dpi).convert('RGB')
+    draw = ImageDraw.Draw(image)
+    for box in boxes:
+        draw.rectangle(pdf_to_pixels(geometry, dpi, box), fill=fill)
+    buffer = io.BytesIO()
+    image.save(buffer, 'PDF', resolution=dpi)
+    buffer.seek(0)
+    return PyPDF2.PdfReader(buffer).pages[0]
@@ -0,0 +1,306 @@
+from PyPDF2 import PdfReader, PdfWriter
+from PyPDF2._cmap import build_char_map
+from urllib.parse import unquote
+from PyPDF2.generic import (
+    ArrayObject, ByteStringObject, ContentStream, DecodedStreamObject,
+    EncodedStreamObject, FloatObject, NameObject, TextStringObject,
+)
+from matcher import Matcher
+from pdfocr import redact_scanned_page, OCR_DPI
+
+# Glyph width, in thousandths of an em, when a font does not say
+DEFAULT_WIDTH = 500
+SHOW_OPERATORS = (b'Tj', b'TJ', b"'", b'"')
+# Annotation entries that can carry a value: link targets, comments, titles
+ANNOTATION_KEYS = ('/Contents', '/T')
+
+def _compact(text):
+    return ''.join(text.split())
+
+def _raw(value):
+    if isinstance(value, TextStringObject):
+        return value.get_original_bytes()
+    return bytes(value)
+
+def _widths(font):
+    # Code -> glyph width for simple fonts (/Widths) and CID fonts (/W)
+    widths = {}
+    if font.get('/Subtype') == '/Type0':
+        descendant = font['/DescendantFonts'][0].get_object()
+        default = float(descendant.get('/DW', 1000))
+        entries = descendant.get('/W')
+        entries = entries.get_object() if entries is not None else []
+        i = 0
+        while i < len(entries):
+            first = int(entries[i])
+            following = entries[i + 1].get_object()
+            if isinstance(following, list):
+                for offset, width in enumerate(following):
+                    widths[first + offset] = float(width)
+                i += 2
+            else:
+                for code in range(first, int(following) + 1):
+                    widths[code] = float(entries[i + 2])
+                i += 3
+        return widths, default
+    first = int(font.get('/FirstChar', 0))
+    for offset, width in enumerate(font.get('/Widths', [])):
+        widths[first + offset] = float(width)
+    descriptor = font.get('/FontDescriptor')
+    default = float(descriptor.get_object().get('/MissingWidth', DEFAULT_WIDTH)) if descriptor else DEFAULT_WIDTH
+    return widths, default
+
+class _Font:
+    """Decodes one font's show-string bytes into units of (code bytes, text)."""
+
+    def __init__(self, name, owner):
+        _, _, self.encoding, self.map, font = build_char_map(name, 200.0, owner)
+        self.size = self.map.get(-1, 1)
+        self.widths, self.default = _widths(font)
+
+    def units(self, data):
+        units = []
+        for i in range(0, len(data) - self.size + 1, self.size):
+            code = data[i:i + self.size]
+            if isinstance(self.encoding, str):
+                try:
+                    char = code.decode(self.encoding, 'surrogatepass')
+                except Exception:
+                    char = code.decode('utf-16-be' if self.encoding == 'charmap' else 'charmap', 'surrogatepass')
+            else:
+                char = self.encoding.get(code[0], chr(code[0]))
+            units.append((code, self.map.get(char, char)))
+        return units
+
+    def width(self, code):
+        return self.widths.get(int.from_bytes(code, 'big'), self.default)
+
+def _show_strings(operands, operator):
+    # The show operator's array of strings and kerning numbers
+    if operator == b'TJ':
+        return list(operands[0])
+    return [operands[2] if operator == b'"' else operands[0]]
+
+def _redact_operations(owner, contents, reader, matcher):
+    # owner holds the /Resources the fonts are looked up in: the page, or a
+    # form XObject with its own resources
+    content = ContentStream(contents, reader)
+    fonts = {}
+    font = None
+    font_size = 1.0
+    char_spacing = 0.0
+    stack = []
+    # Every glyph shown on the page: (operation index, item index, unit index)
+    # plus, per glyph, its decoded text
+    glyphs = []
+    decoded = {}
+    for index, (operands, operator) in enumerate(content.operations):
+        if operator == b'q':
+            stack.append((font, font_size, char_spacing))
+        elif operator == b'Q' and stack:
+            font, font_size, char_spacing = stack.pop()
+        elif operator == b'Tf':
+            name = operands[0]
+            if name not in fonts:
+                fonts[name] = _Font(name, owner)
+            font, font_size = fonts[name], float(operands[1])
+        elif operator == b'Tc':
+            char_spacing = float(operands[0])
+        elif operator == b'"':
+            char_spacing = float(operands[1])
+        if operator not in SHOW_OPERATORS or font is None:
+            continue
+        items = []
+        for item_index, item in enumerate(_show_strings(operands, operator)):
+            if isinstance(item, (bytes, str)):
+                units = font.units(_raw(item))
+                items.append(units)
+                glyphs.extend((index, item_index, unit_index, text) for unit_index, (_, text) in enumerate(units))
+            else:
+                items.append(item)
+        decoded[index] = (items, font, font_size, char_spacing)
+
+    # Match on the page's glyph text with whitespace dropped, since the order
+    # and spacing of show operators rarely matches the extracted text
+    compact = []
+    owners = []
+    for position, (_, _, _, text) in enumerate(glyphs):
+        for char in _compact(text):
+            compact.append(char)
+            owners.append(position)
+    hits = set()
+    for start, end in matcher.finditer(''.join(compact)):
+        hits.update(owners[start:end])
+    if not hits:
+        return None, 0
+
+    removed = {}
+    for position in hits:
+        index, item_index, unit_index, _ = glyphs[position]
+        removed.setdefault(index, set()).add((item_index, unit_index))
+
+    operations = []
+    for index, (operands, operator) in enumerate(content.operations):
+        if index not in removed:
+            operations.append((operands, operator))
+            continue
+        items, font, font_size, char_spacing = decoded[index]
+        array = ArrayObject()
+        for item_index, item in enumerate(items):
+            if not isinstance(item, list):
+                array.append(item)
+                continue
+            kept = b''
+            gap = 0.0
+            for unit_index, (code, _) in enumerate(item):
+                if (item_index, unit_index) in removed[index]:
+                    # Leave the glyph's advance as a blank so the rest of
+                    # the line stays where it was
+                    gap += font.width(code) + (char_spacing * 1000 / font_size if font_size else 0)
+                    continue
+                if gap:
+                    if kept:
+                        array.append(ByteStringObject(kept))
+                    array.append(FloatObject(round(-gap, 3)))
+                    kept, gap = b'', 0.0
+                kept += code
+            if kept:
+                array.append(ByteStringObject(kept))
+            if gap:
+                array.append(FloatObject(round(-gap, 3)))
+        if operator == b"'":
+            operations.append(([], b'T*'))
+        elif operator == b'"':
+            operations.append(([operands[0]], b'Tw'))
+            operations.append(([operands[1]], b'Tc'))
+            operations.append(([], b'T*'))
+        operations.append(([array], b'TJ'))
+    content.operations = operations
+    stream = DecodedStreamObject()
+    stream.set_data(content.get_data())
+    return stream.flate_encode(), len(hits)
+
+def _forms(owner, seen):
+    # Form XObjects drawn from owner's resources, nested forms included
+    resources = owner.get('/Resources')
+    xobjects = resources.get_object().get('/XObject') if resources is not None else None
+    if xobjects is None:
+        return
+    for name in xobjects.get_object():
+        form = xobjects.get_object()[name]
+        key = id(form)
+        if key in seen or form.get('/Subtype') != '/Form':
+            continue
+        seen.add(key)
+        yield form
+        yield from _forms(form, seen)
+
+def _replace_stream(target, encoded):
+    # Swap a stream's data in place, in the reader, so every page that draws
+    # it is written with the redacted data and the original never reaches
+    # the writer
+    target._data = encoded._data
+    if isinstance(target, EncodedStreamObject):
+        target.decoded_self = None
+    target[NameObject('/Filter')] = NameObject('/FlateDecode')
+    target.pop('/DecodeParms', None)
+
+def _annotation_texts(annotation):
+    texts = [str(annotation[key].get_object()) for key in ANNOTATION_KEYS if key in annotation]
+    action = annotation.get('/A')
+    if action is not None and '/URI' in action.get_object():
+        uri = action.get_object()['/URI']
+        uri = uri.decode('latin-1') if isinstance(uri, bytes) else str(uri)
+        texts.append(unquote(uri))
+    return texts
+
+def _drop_annotations(page, matcher):
+    # Remove links and annotations whose target, contents or title spell a
+    # value; returns how many were dropped
+    annotations = page.get('/Annots')
+    if annotations is None:
+        return 0
+    kept = ArrayObject()
+    for reference in annotations.get_object():
+        texts = _annotation_texts(reference.get_object())
+        if any(next(iter(matcher.finditer(_compact(text))), None) for text in texts):
+            continue
+        kept.append(reference)
+    dropped = len(annotations.get_object()) - len(kept)
+    if dropped:
+        page[NameObject('/Annots')] = kept
+    return dropped
+
+def redact_pdf(input_path, output_file, page_values, page_boxes=None, dpi=OCR_DPI):
+    """
+    Write a copy of a PDF with the given values removed.
+
+    Only pages with values are decoded: their content streams, and the form
+    XObjects they draw, are parsed, the glyphs spelling each value are
+    dropped from the show operators and replaced by an equal advance, and
+    the streams are re-serialized. Links and annotations anywhere in the
+    document whose URI, contents or title contain a value are removed.
+    Scanned pages with OCR boxes are re-rendered with the boxes painted over
+    and replace the original page. Every other page, image and font is
+    copied as its original encoded bytes. The output is written from
+    scratch rather than as an incremental update, so the original content
+    streams are not left behind in the file.
+
+    Args:
+        input_path (str): PDF to redact
+        output_file (str): Where to write the redacted copy
+        page_values (dict): Page number -> values to remove on that page
+        page_boxes (dict): Page number -> [x0, y0, x1, y1] boxes in points
+            to paint over on scanned pages
+        dpi (int): Resolution scanned pages are re-rendered at
+
+    Returns:
+        int: Glyphs removed
+    """
+    page_boxes = page_boxes or {}
+    reader = PdfReader(input_path)
+    writer = PdfWriter()
+    removed = 0
+    dropped = 0
+    every_value = {_compact(value) for values in page_values.values() for value in values}
+    document_matcher = Matcher(every_value) if every_value else None
+
+    # Redact everything in the reader first: form XObjects may be shared by
+    # several pages, and a page cloned into the writer before a later page
+    # redacted a shared form would keep the original
+    streams = {}
+    for page_num, page in enumerate(reader.pages):
+        if page_boxes.get(page_num):
+            continue
+        if document_matcher:
+            dropped += _drop_annotations(page, document_matcher)
+        values = page_values.get(page_num)
+        if not values:
+            continue
+        matcher = Matcher({_compact(value) for value in values})
+        stream, count = _redact_operations(page, page.get_contents(), reader, matcher)
+        removed += count
+        if stream is not None:
+            streams[page_num] = stream
+        for form in _forms(page, set()):
+            own_fonts = '/Resources' in form and '/Font' in form['/Resources'].get_object()
+            owner = form if own_fonts else page
+            form_stream, count = _redact_operations(owner, form, reader, matcher)
+            if form_stream is not None:
+                _replace_stream(form, form_stream)
+                removed += count
+
+    for page_num, page in enumerate(reader.pages):
+        if page_boxes.get(page_num):
+            writer.add_page(redact_scanned_page(input_path, page_num, page_boxes[page_num], dpi))
+        elif page_num not in streams:
+            writer.add_page(page)
+        else:
+            # Leave the old contents out of the clone so they are never written
+            copy = writer.add_page(page, excluded_keys=['/Contents'])
+            copy[NameObject('/Contents')] = writer._add_object(streams[page_num])
+    if dropped:
+        print(f"Removed {dropped} links and annotations containing redacted values")
+    with open(output_file, 'wb') as output_pdf:
+        writer.write(output_pdf)
+    return removed
@@ -0,0 +1,211 @@
+import csv
+import io
+import ipaddress
+import random
+import re
+
+SAMPLE_ROWS = 500
+# Characters of the file scanned for the sample; a larger file is sampled
+# from this prefix, so suggesting stays well under a second on multi-GB files
+SAMPLE_BYTES = 16 * 1024 * 1024
+# Share of sampled values a detector has to match before its type is suggested
+MIN_CONFIDENCE = 0.6
+# Detectors are first tried on this many values and only scored on the whole
+# sample if they come close, which keeps wide files cheap
+PROBE_SIZE = 50
+
+def _records(file):
+    # Raw CSV records, joining physical lines while a quoted field is still
+    # open; only sampled records are ever parsed into fields
+    pending = ''
+    for line in file:
+        pending += line
+        if pending.count('"') % 2 == 0:
+            yield pending
+            pending = ''
+    if pending:
+        yield pending
+
+def reservoir_sample(file_path, k=SAMPLE_ROWS, seed=0, max_bytes=SAMPLE_BYTES):
+    """
+    Draw a uniform random sample of rows in one pass, without loading the file.
+
+    Only the first max_bytes characters are scanned: on a larger file the
+    sample is uniform over that prefix rather than the whole file.
+
+    Returns:
+        tuple: (header list, list of sampled rows)
+    """
+    rng = random.Random(seed)
+    sample = []
+    scanned = 0
+    with open(file_path, mode='r', newline='') as file:
+        records = _records(file)
+        headers = next(csv.reader([next(records, '')]), [])
+        for seen, record in enumerate(records):
+            scanned += len(record)
+            if max_bytes and scanned > max_bytes:
+                print(f"Sampled the first {seen} rows of {file_path}")
+                break
+            if seen < k:
+                sample.append(record)
+            else:
+                slot = rng.randint(0, seen)
+                if slot < k:
+                    sample[slot] = record
+    return headers, [row for record in sample for row in csv.reader(io.StringIO(record))]
+
+def _luhn(value):
+    digits = [int(c) for c in value if c.isdigit()]
+    if not 13 <= len(digits) <= 19:
+        return False
+    total = 0
+    for i, digit in enumerate(reversed(digits)):
+        if i % 2:
+            digit *= 2
+            if digit > 9:
+                digit -= 9
+        total += digit
+    return total % 10 == 0
+
+def _ip(value):
+    try:
+        ipaddress.ip_address(value)
+        return True
+    except ValueError:
+        return False
+
+def _phone(value):
+    # Decimals such as 34.4972 fit the phone pattern but are measurements
+    if DECIMAL_RE.fullmatch(value):
+        return False
+    return bool(PHONE_RE.fullmatch(value)) and 7 <= sum(c.isdigit() for c in value) <= 15
+
+EMAIL_RE = re.compile(r'[\w.+-]+@[\w-]+(\.[\w-]+)+')
+PHONE_RE = re.compile(r'\+?[\d\s().-]+(\s*(x|ext\.?)\s*\d+)?', re.IGNORECASE)
+CARD_RE = re.compile(r'\d[\d -]{11,21}\d')
+SSN_RE = re.compile(r'\d{3}-\d{2}-\d{4}')
+URL_RE = re.compile(r'(https?://|www\.)\S+', re.IGNORECASE)
+ZIP_RE = re.compile(r'\d{5}(-\d{4})?')
+DATE_RE = re.compile(r'\d{4}[-/.]\d{1,2}[-/.]\d{1,2}|\d{1,2}[-/.]\d{1,2}[-/.]\d{2,4}')
+ADDRESS_RE = re.compile(
+    r'\d+\s+\w+.*\b(st|street|ave|avenue|rd|road|blvd|ln|lane|dr|drive|ct|court|way|pl|place|ter|suite|apt|unit|box)\b'
+    r'|\b[A-Z]{2}\s+\d{5}(-\d{4})?$',
+    re.IGNORECASE | re.DOTALL,
+)
+NAME_RE = re.compile(r"[A-Z][a-z'-]+(\s+[A-Z][a-z'.-]*){1,3}")
+NUMBER_RE = re.compile(r'[-+]?\d+(\.\d+)?')
+DECIMAL_RE = re.compile(r'[-+]?\d*\.\d+')
+
+# Checked in order; the first type to reach the best score wins ties, so the
+# more specific detectors come first
+DETECTORS = [
+    ('email', lambda v: bool(EMAIL_RE.fullmatch(v))),
+    ('ssn', lambda v: bool(SSN_RE.fullmatch(v))),
+    ('credit_card', lambda v: bool(CARD_RE.fullmatch(v)) and _luhn(v)),
+    ('ip_address', _ip),
+    ('url', lambda v: bool(URL_RE.match(v))),
+    ('date', lambda v: bool(DATE_RE.fullmatch(v))),
+    ('zip', lambda v: bool(ZIP_RE.fullmatch(v))),
+    ('phone', _phone),
+    ('address', lambda v: bool(ADDRESS_RE.search(v))),
+    ('name', lambda v: bool(NAME_RE.fullmatch(v))),
+    ('number', lambda v: bool(NUMBER_RE.fullmatch(v))),
+]
+
+# Header names that back up a detector when the values alone are borderline
+HEADER_HINTS = {
+    'email': ('email', 'e-mail', 'mail'),
+    'phone': ('phone', 'mobile', 'tel', 'fax'),
+    'name': ('name',),
+    'address': ('address', 'street', 'addr'),
+    'ssn': ('ssn', 'social'),
+    'credit_card': ('card', 'cc', 'pan'),
+    'ip_address': ('ip',),
+    'zip': ('zip', 'postal', 'postcode'),
+    'date': ('date', 'dob', 'birth'),
+    'id': ('id', 'account', 'passport', 'licen'),
+}
+HEADER_BONUS = 0.15
+
+# Suggested column plan for each type; None leaves the column untouched.
+# Local-engine plans pseudonymize the column as its detected type.
+DEFAULT_PLANS = {
+    'email': {'mode': 'mask:email_domain'},
+    'phone': {'mode': 'mask:phone'},
+    'ssn': {'mode': 'mask:digits'},
+    'credit_card': {'mode': 'mask:keep_last', 'keep': 4},
+    'ip_address': {'mode': 'mask'},
+    'zip': {'mode': 'mask:digits'},
+    'date': {'mode': None},
+    'url': {'mode': 'mask'},
+    'address': {'mode': 'obfuscate', 'engine': 'local'},
+    'name': {'mode': 'obfuscate', 'engine': 'local'},
+    'id': {'mode': 'obfuscate', 'engine': 'local'},
+    'number': {'mode': None},
+    'text': {'mode': None},
+}
+
+def _looks_like_id(values):
+    # Value-shape statistics: mostly distinct tokens without spaces, mixing
+    # digits in, with a narrow spread of lengths
+    if len(values) < 2:
+        return 0.0
+    tokens = [v for v in values if ' ' not in v and any(c.isdigit() for c in v)]
+    if len(tokens) < len(values) * MIN_CONFIDENCE:
+        return 0.0
+    lengths = [len(v) for v in tokens]
+    if max(lengths) - min(lengths) > 4 or len(set(tokens)) < len(tokens) * 0.9:
+        return 0.0
+    return len(tokens) / len(values)
+
+def classify_column(name, values):
+    """
+    Score one column's sampled values against the PII detectors.
+
+    Returns:
+        dict: 'name', suggested 'type', 'confidence' (0-1) and the default
+            plan entries for that type ('mode' and engine settings)
+    """
+    values = [v.strip() for v in values if v.strip()]
+    scores = {}
+    if values:
+        probe = values[:PROBE_SIZE]
+        for pii_type, detector in DETECTORS:
+            score = sum(1 for v in probe if detector(v)) / len(probe)
+            if score >= MIN_CONFIDENCE - HEADER_BONUS and len(values) > len(probe):
+                score = sum(1 for v in values if detector(v)) / len(values)
+            scores[pii_type] = score
+        scores['id'] = _looks_like_id(values)
+    header = name.lower()
+    for pii_type, hints in HEADER_HINTS.items():
+        if pii_type in scores and any(hint in header for hint in hints):
+            scores[pii_type] = min(scores[pii_type] + HEADER_BONUS, 1.0)
+
+    best, confidence = 'text', 0.0
+    for pii_type, score in scores.items():
+        if score > confidence:
+            best, confidence = pii_type, score
+    if confidence < MIN_CONFIDENCE:
+        best = 'text'
+    return {**DEFAULT_PLANS[best], 'name': name, 'type': best, 'confidence': round(confidence, 3)}
+
+def classify_csv(file_path, k=SAMPLE_ROWS, seed=0, max_bytes=SAMPLE_BYTES):
+    """
+    Suggest a PII type, confidence and default mode for every header of a CSV.
+
+    Args:
+        file_path (str): Path to the CSV
+        k (int): Rows to sample
+        seed (int): Seed for the sample, so suggestions are repeatable
+        max_bytes (int): Characters scanned; larger files are sampled from
+            this prefix, see reservoir_sample
+
+    Returns:
+        list: One classify_column result per header, in header order
+    """
+    headers, rows = reservoir_sample(file_path, k, seed, max_bytes)
+    suggestions = []
+    for i, name in enumerate(headers):
+        suggestions.append(classify_column(name, [row[i] for row in rows if i < len(row)]))
+    return suggestions
@@ -0,0 +1,138 @@
+import hashlib
+import os
+import re
+import numpy as np
+import pandas as pd
+from masking import join_values, split_values
+
+# Replacements come from a keyed hash of the original value, so the same value
+# always gets the same fake under the same secret, across runs and files.
+DEFAULT_SECRET = 'fidelius'
+
+FIRST_NAMES = np.array([
+    'James', 'Mary', 'Robert', 'Patricia', 'John', 'Jennifer', 'Michael', 'Linda', 'David', 'Elizabeth',
+    'William', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica', 'Thomas', 'Sarah', 'Charles', 'Karen',
+    'Daniel', 'Lisa', 'Matthew', 'Nancy', 'Anthony', 'Sandra', 'Mark', 'Ashley', 'Steven', 'Emily',
+    'Arjun', 'Priya', 'Rahul', 'Ananya', 'Wei', 'Mei', 'Hiroshi', 'Yuki', 'Omar', 'Fatima',
+    'Lucas', 'Sofia', 'Mateo', 'Valentina', 'Noah', 'Olivia', 'Liam', 'Emma', 'Ethan', 'Ava',
+], dtype=object)
+LAST_NAMES = np.array([
+    'Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez', 'Martinez',
+    'Hernandez', 'Lopez', 'Gonzalez', 'Wilson', 'Anderson', 'Thomas', 'Taylor', 'Moore', 'Jackson', 'Martin',
+    'Lee', 'Perez', 'Thompson', 'White', 'Harris', 'Sanchez', 'Clark', 'Ramirez', 'Lewis', 'Robinson',
+    'Nair', 'Menon', 'Sharma', 'Iyer', 'Chen', 'Wang', 'Tanaka', 'Sato', 'Haddad', 'Khan',
+    'Silva', 'Costa', 'Rossi', 'Muller', 'Novak', 'Walker', 'Young', 'Allen', 'King', 'Wright',
+], dtype=object)
+STREETS = np.array([
+    'Maple', 'Oak', 'Pine', 'Cedar', 'Elm', 'Willow', 'Birch', 'Lakeview', 'Hillcrest', 'Sunset',
+    'Park', 'Washington', 'Lincoln', 'Jefferson', 'Madison', 'Franklin', 'Highland', 'Meadow', 'River', 'Spring',
+], dtype=object)
+STREET_SUFFIXES = np.array(['St', 'Ave', 'Rd', 'Blvd', 'Ln', 'Dr', 'Ct', 'Way', 'Pl', 'Ter'], dtype=object)
+CITIES = np.array([
+    'Springfield', 'Riverside', 'Fairview', 'Greenville', 'Franklin', 'Clinton', 'Salem', 'Madison', 'Georgetown', 'Arlington',
+    'Ashland', 'Burlington', 'Dover', 'Hudson', 'Kingston', 'Milford', 'Newport', 'Oxford', 'Troy', 'Winchester',
+], dtype=object)
+EMAIL_DOMAINS = np.array(['example.com', 'example.org', 'example.net', 'mail.example.com'], dtype=object)
+
+def _key(secret):
+    secret = secret or os.environ.get('FIDELIUS_SECRET', DEFAULT_SECRET)
+    # hash_pandas_object takes exactly 16 characters of key
+    return hashlib.blake2b(secret.encode('utf-8'), digest_size=8).hexdigest()
+
+def _hash(series, key):
+    return pd.util.hash_pandas_object(series, index=False, hash_key=key).to_numpy()
+
+def _mix(hashes, salt):
+    # splitmix64 finalizer, to draw several independent numbers from one hash
+    with np.errstate(over='ignore'):
+        z = hashes + np.uint64(salt) * np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+def _pick(words, hashes, salt):
+    return pd.Series(words[_mix(hashes, salt) % np.uint64(len(words))], dtype=str)
+
+def _substitute(series, hashes):
+    # Digits become digits and letters letters of the same case; everything
+    # else, separators included, stays where it was
+    values = series.tolist()
+    joined = join_values(values)
+    if joined is None:
+        return pd.concat([_substitute(series.iloc[[i]], hashes[[i]]) for i in range(len(values))], ignore_index=True)
+    data, sep, separator = joined
+    starts = np.concatenate(([0], np.flatnonzero(sep) + 1))
+    element = np.cumsum(sep) - sep
+    position = np.arange(len(data)) - starts[element]
+    draw = _mix(hashes[element], 1) ^ _mix(position.astype(np.uint64), 2)
+    draw = _mix(draw, 3)
+    out = data.copy()
+    digit = (data >= ord('0')) & (data <= ord('9'))
+    upper = (data >= ord('A')) & (data <= ord('Z'))
+    lower = (data >= ord('a')) & (data <= ord('z'))
+    out[digit] = ord('0') + draw[digit] % np.uint64(10)
+    out[upper] = ord('A') + draw[upper] % np.uint64(26)
+    out[lower] = ord('a') + draw[lower] % np.uint64(26)
+    return pd.Series(split_values(out, separator), dtype=str)
+
+def _name(series, hashes):
+    first = _pick(FIRST_NAMES, hashes, 10)
+    full = first + ' ' + _pick(LAST_NAMES, hashes, 11)
+    # Single-word originals get a single-word name
+    spaced = series.str.strip().str.contains(' ').to_numpy()
+    return full.where(spaced, first)
+
+def _email(series, hashes):
+    number = pd.Series(_mix(hashes, 22) % np.uint64(100)).astype(str)
+    local = (_pick(FIRST_NAMES, hashes, 20) + '.' + _pick(LAST_NAMES, hashes, 21)).str.lower()
+    return local + number + '@' + _pick(EMAIL_DOMAINS, hashes, 23)
+
+def _street(series, hashes):
+    return _pick(STREETS, hashes, 40) + ' ' + _pick(STREET_SUFFIXES, hashes, 41)
+
+def _city(series, hashes):
+    return _pick(CITIES, hashes, 50)
+
+def _address(series, hashes):
+    # The street line is replaced; the rest (city, state, zip) keeps its shape
+    # but has its digits and letters substituted
+    parts = series.str.extract(r'^([^,\n]*)(.*)$', flags=re.DOTALL)
+    number = pd.Series(_mix(hashes, 30) % np.uint64(9899) + np.uint64(100)).astype(str)
+    street = number + ' ' + _pick(STREETS, hashes, 31) + ' ' + _pick(STREET_SUFFIXES, hashes, 32)
+    return street + _substitute(parts[1].reset_index(drop=True), hashes)
+
+PSEUDONYM_KINDS = {
+    'name': _name,
+    'email': _email,
+    'phone': _substitute,
+    'address': _address,
+    'street': _street,
+    'city': _city,
+    'id': _substitute,
+    'text': _substitute,
+}
+
+def pseudonymize_series(series, kind='text', secret=None):
+    """
+    Replace a column with realistic, deterministic fake values without the LLM.
+
+    Args:
+        series (Series): Column values
+        kind (str): One of PSEUDONYM_KINDS
+        secret (str): Key for the hash; defaults to $FIDELIUS_SECRET
+
+    Returns:
+        Series: The pseudonymized values, aligned to series.index
+
+    Raises:
+        Exception: If the kind is unknown
+    """
+    if kind not in PSEUDONYM_KINDS:
+        raise Exception(f"Unknown pseudonym type: {kind}. Expected one of {', '.join(PSEUDONYM_KINDS)}")
+    # Each distinct value is generated once and mapped back to its rows
+    codes, uniques = pd.factorize(series.astype(str))
+    uniques = pd.Series(uniques, dtype=str)
+    fakes = PSEUDONYM_KINDS[kind](uniques, _hash(uniques, _key(secret))).to_numpy(dtype=object)
+    fakes[(uniques == '').to_numpy()] = ''
+    replacements = np.append(fakes, '')
+    return pd.Series(replacements[codes], index=series.index, name=series.name, dtype=str)
@@ -0,0 +1,170 @@
+import json
+import re
+import string
+import threading
+import pandas as pd
+from chat import chatrule
+from obfuscation import obfuscate_series
+from pseudonymize import pseudonymize_series, PSEUDONYM_KINDS
+from sessions import SessionStore
+
+SAMPLE_SIZE = 20
+# Share of the sample a rule has to match before it is trusted for the column
+MIN_SAMPLE_MATCH = 0.5
+RULE_GENERATORS = ['keep'] + list(PSEUDONYM_KINDS)
+
+RULE_PROMPT = (
+    "You turn an obfuscation instruction into a rule that a program applies to every value of a column. "
+    "Return 'pattern', a Python regular expression with named groups that matches a whole value; "
+    "'template', the output value with {group} placeholders for the named groups; and 'generators', "
+    "which says for each group how it is replaced: " + ", ".join(RULE_GENERATORS) + ". "
+    "'keep' leaves the group as it is."
+)
+
+MAX_RULES = 256
+# A failed derivation is retried after this many seconds rather than never
+FAILED_RULE_TTL = 60
+
+# (column, prompt) -> validated rule; failures are kept briefly so a burst
+# of batches does not ask the LLM again for every one of them
+_rules = SessionStore(max_entries=MAX_RULES)
+_failed_rules = SessionStore(ttl=FAILED_RULE_TTL, max_entries=MAX_RULES)
+# Keys whose rule is being derived -> Event set when it is done; the lock
+# only guards these lookups, never the LLM call
+_deriving = {}
+_rule_lock = threading.Lock()
+
+def validate_rule(rule, sample):
+    """
+    Check a rule returned by the LLM before it touches any data.
+
+    Args:
+        rule (dict): 'pattern', 'template' and 'generators' from chatrule
+        sample (list): Values the rule was derived from
+
+    Returns:
+        dict: The rule with a generator for every group ('keep' by default)
+
+    Raises:
+        Exception: If the rule is malformed or matches too little of the sample
+    """
+    try:
+        regex = re.compile(rule['pattern'])
+    except (KeyError, re.error) as e:
+        raise Exception(f"Rule pattern does not compile: {str(e)}")
+    groups = set(regex.groupindex)
+    fields = {field for _, field, _, _ in string.Formatter().parse(rule.get('template', '')) if field is not None}
+    if not fields <= groups:
+        raise Exception(f"Rule template uses unknown groups: {', '.join(sorted(fields - groups))}")
+    generators = {group: 'keep' for group in groups}
+    for group, generator in rule.get('generators', {}).items():
+        if group not in groups or generator not in RULE_GENERATORS:
+            raise Exception(f"Rule has an invalid generator {generator} for group {group}")
+        generators[group] = generator
+    matched = sum(1 for value in sample if regex.fullmatch(value))
+    if sample and matched / len(sample) < MIN_SAMPLE_MATCH:
+        raise Exception(f"Rule matches only {matched} of {len(sample)} sample values")
+    return {'pattern': rule['pattern'], 'template': rule['template'], 'generators': generators}
+
+def derive_rule(column, prompt, sample, chat=chatrule):
+    """
+    Get the rule for a column's prompt, asking the LLM once per (column, prompt).
+
+    Rules are cached in a bounded store; a failure is remembered for
+    FAILED_RULE_TTL seconds and then derived again. Callers asking for a key
+    that is being derived wait for it; other keys are derived concurrently.
+
+    Returns:
+        dict: A validated rule, or None if the LLM could not give a usable one
+    """
+    key = json.dumps([column, prompt])
+    while True:
+        with _rule_lock:
+            rule = _rules.get(key)
+            if rule is not None or _failed_rules.get(key) is not None:
+                return rule
+            done = _deriving.get(key)
+            if done is None:
+                done = _deriving[key] = threading.Event()
+                break
+        done.wait()
+
+    rule = None
+    try:
+        content = json.dumps({'instruction': prompt, 'sample': sample})
+        rule = validate_rule(chat(RULE_PROMPT, content), sample)
+        print(f"Derived rule for {column}: {rule['pattern']} -> {rule['template']}")
+    except Exception as e:
+        print(f"No usable rule for {column}, using the LLM for every value: {str(e)}")
+    finally:
+        with _rule_lock:
+            if rule is None:
+                _failed_rules.put(key, True)
+            else:
+                _rules.put(key, rule)
+            del _deriving[key]
+        done.set()
+    return rule
+
+def apply_rule(series, rule, secret=None):
+    """
+    Apply a rule to a whole column with vectorized string ops.
+
+    Returns:
+        tuple: (Series of transformed values, boolean Series of rows that matched)
+    """
+    values = series.astype(str)
+    pattern = f"(?:{rule['pattern']})"
+    matched = values.str.fullmatch(pattern)
+    if re.compile(pattern).groups:
+        parts = values[matched].str.extract(pattern).fillna('')
+    else:
+        # Nothing to extract: every matched row becomes the literal template
+        parts = pd.DataFrame(index=values[matched].index)
+    for group, generator in rule['generators'].items():
+        if generator != 'keep':
+            parts[group] = pseudonymize_series(parts[group], generator, secret)
+
+    result = pd.Series('', index=parts.index, dtype=str)
+    for literal, field, _, _ in string.Formatter().parse(rule['template']):
+        if literal:
+            result = result + literal
+        if field is not None:
+            result = result + parts[field]
+    return result, matched
+
+def rule_obfuscate_series(series, column, prompt, secret=None, mapping=None, rules=None, **kwargs):
+    """
+    Obfuscate a column with an LLM-derived rule, sending only a small sample
+    and the rows the rule does not match to the LLM.
+
+    Args:
+        series (Series): Column values
+        column (str): Column name, part of the rule cache key
+        prompt (str): The column's obfuscation instruction
+        secret (str): Key for the generators and the mapping
+        mapping (dict): Passed to obfuscate_series for the unmatched rows
+        rules (dict): Column -> rule already used for this output; the
+            column's rule is taken from it, or derived and recorded in it
+        **kwargs: Passed to obfuscate_series
+
+    Returns:
+        Series: The obfuscated values, aligned to series.index
+    """
+    values = series.astype(str)
+    sample = values.drop_duplicates().head(SAMPLE_SIZE).tolist()
+    if rules is not None and column in rules:
+        rule = rules[column]
+    else:
+        rule = derive_rule(column, prompt, sample)
+        if rules is not None:
+            rules[column] = rule
+    if rule is None:
+        return obfuscate_series(series, prompt, mapping=mapping, secret=secret, **kwargs)
+
+    result, matched = apply_rule(values, rule, secret)
+    print(f"Rule matched {int(matched.sum())} of {len(values)} rows in {column}")
+    if not matched.all():
+        unmatched = values[~matched]
+        result = pd.concat([result, obfuscate_series(unmatched, prompt, mapping=mapping, secret=secret, **kwargs)])
+    return result.reindex(series.index).rename(series.name)
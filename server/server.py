@@ -1,8 +1,12 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
+import json
 import os
-from imagehandler import predict_image_entities, redact_image
-from csvhandler import predictheaders, maskobfcsv
-from pdfhandler import predictpdfheaders, maskobfpdf
+import time
+from imagehandler import analyze_file, analysis_cache_stats, predict_image_entities, redact_image, redact_image_bytes
+from engines import warm, engine_stats
+from imagebatch import redact_images, IMAGE_TIMEOUT
+from csvhandler import predictheaders, suggestheaders, maskobfcsv
+from pdfhandler import predictpdfheaders, pdfprogress, maskobfpdf, PAGE_CONCURRENCY, TOKEN_BUDGET, OCR_DPI
 import subprocess  # For running external Python scripts
 from flask_cors import CORS
 from run_audio_pii_censor import main
@@ -26,7 +30,11 @@ def getcsvheader():
     
     try:
         headers = predictheaders(file_path)
-        return jsonify({"headers": headers})
+        if not data.get('suggest'):
+            return jsonify({"headers": headers})
+        # Opt-in: classifying samples the file, which reading headers does not
+        suggestions = suggestheaders(file_path)
+        return jsonify({"headers": headers, "suggestions": suggestions})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -38,10 +46,12 @@ def mask_obfuscate_csv():
         return jsonify({'error': 'No data provided'}), 400
     
     try:
-        output_file = maskobfcsv(json_data)  # Now expects inputPath
+        result = maskobfcsv(json_data)  # Now expects inputPath
         return jsonify({
-            'output': output_file,
-            'filename': os.path.basename(output_file)
+            'output': result['output'],
+            'filename': os.path.basename(result['output']),
+            'rows': result['rows'],
+            'columns': result['columns']
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -55,12 +65,33 @@ def getpdfheader():
         return jsonify({'error': 'No file path provided'}), 400
     
     try:
-        headers = predictpdfheaders(pfile_path)
-        return jsonify({"headers": headers})
+        headers = predictpdfheaders(
+            pfile_path,
+            workers=data.get('workers'),
+            concurrency=data.get('concurrency', PAGE_CONCURRENCY),
+            budget=data.get('tokenBudget', TOKEN_BUDGET),
+            dedupe=data.get('dedupe', True),
+            ocr=data.get('ocr', True),
+            dpi=data.get('dpi', OCR_DPI)
+        )
+        return jsonify({"headers": headers, "report": pdfprogress(pfile_path)})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+@app.route("/getpdfprogress", methods=['POST'])
+def getpdfprogress():
+    data = request.get_json()
+    pfile_path = data.get('filePath')
+    if not pfile_path:
+        return jsonify({'error': 'No file path provided'}), 400
+
+    progress = pdfprogress(pfile_path)
+    if progress is None:
+        return jsonify({'error': 'File has not been submitted'}), 404
+    return jsonify(progress)
+
+
 @app.route("/maskobfpdf", methods=['GET', 'POST'])
 def maskpdf():
     input_data = request.get_json()
@@ -92,7 +123,11 @@ def get_image_entities():
         entities = predict_image_entities(file_path)
         redacted_path = redact_image(
             file_path=file_path,
-            fill_color=(255, 192, 203)  # Default pink color
+            fill_color=(255, 192, 203),  # Default pink color
+            output_format=data.get('format', 'source'),
+            level=data.get('level'),
+            output_dir=output_path,
+            workers=data.get('workers', 1)  # Processes for the frames of a TIFF
         )
         
         return jsonify({
@@ -104,6 +139,21 @@ def get_image_entities():
         return jsonify({"error": str(e)}), 500
 
 
+@app.route("/analyzeimage", methods=['POST'])
+def analyze_image_endpoint():
+    data = request.get_json()
+    file_path = data.get('filePath') if data else None
+
+    if not file_path:
+        return jsonify({"error": "No file path provided"}), 400
+
+    try:
+        # OCR words, boxes and detected entities from the one shared pass
+        return jsonify(analyze_file(file_path))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @app.route("/redactimage", methods=['POST'])
 def redact_image_endpoint():
     json_data = request.get_json()
@@ -114,12 +164,25 @@ def redact_image_endpoint():
     file_path = json_data.get('filePath')
     entities = json_data.get('entities', None)  # Optional list of entities to redact
     fill_color = json_data.get('fillColor', (255, 192, 203))  # Default to pink from example
+    output_format = json_data.get('format', 'source')  # source, png, jpeg, webp or tiff
+    level = json_data.get('level')  # PNG compression level or JPEG/WebP quality
+    workers = json_data.get('workers', 1)  # Processes for the frames of a TIFF
     
     if not file_path:
         return jsonify({'error': 'No file path provided'}), 400
     
     try:
-        output_path = redact_image(file_path, entities_to_redact=entities, fill_color=tuple(fill_color))
+        if json_data.get('inMemory'):
+            # Send the encoded image back without writing it to disk
+            data, mimetype = redact_image_bytes(
+                file_path, entities_to_redact=entities, fill_color=tuple(fill_color),
+                output_format=output_format, level=level, workers=workers
+            )
+            return Response(data, mimetype=mimetype)
+        output_path = redact_image(
+            file_path, entities_to_redact=entities, fill_color=tuple(fill_color),
+            output_format=output_format, level=level, output_dir=json_data.get('outputPath'), workers=workers
+        )
         return jsonify({
             'output': output_path,
             'filename': os.path.basename(output_path)
@@ -129,6 +192,47 @@ def redact_image_endpoint():
 
 
 
+@app.route("/redactimages", methods=['POST'])
+def redact_images_endpoint():
+    json_data = request.get_json()
+
+    if not json_data:
+        return jsonify({'error': 'No data provided'}), 400
+
+    # A list of paths, or the response of /getfolderfiles as is
+    paths = json_data.get('filePaths') or json_data.get('files')
+    if not paths:
+        return jsonify({'error': 'No file paths provided'}), 400
+
+    def generate():
+        # One JSON line per image as it finishes, then a summary line
+        started = time.perf_counter()
+        counts = {}
+        for result in redact_images(
+            paths,
+            entities_to_redact=json_data.get('entities'),
+            fill_color=json_data.get('fillColor', (255, 192, 203)),
+            workers=json_data.get('workers'),
+            timeout=json_data.get('timeout', IMAGE_TIMEOUT),
+            frame_workers=json_data.get('frameWorkers', 1),
+        ):
+            counts[result['status']] = counts.get(result['status'], 0) + 1
+            yield json.dumps(result) + '\n'
+        yield json.dumps({'done': True, 'counts': counts, 'seconds': round(time.perf_counter() - started, 3)}) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+@app.route('/getenginestats', methods=['GET'])
+def get_engine_stats():
+    return jsonify(engine_stats())
+
+
+@app.route('/getimagecachestats', methods=['GET'])
+def get_image_cache_stats():
+    return jsonify(analysis_cache_stats())
+
+
 @app.route('/getfolderfiles', methods=['POST'])
 def get_folder_files():
     print("Received request to get folder files")  # Debug log
@@ -145,7 +249,7 @@ def get_folder_files():
         for root, _, filenames in os.walk(folder_path):
             for filename in filenames:
                 full_path = os.path.join(root, filename)
-                if filename.lower().endswith(('.csv', '.pdf', '.png', '.jpg', '.jpeg','.mp3')):
+                if filename.lower().endswith(('.csv', '.pdf', '.png', '.jpg', '.jpeg', '.tif', '.tiff', '.mp3')):
                     files.append(full_path)
         
         print(f"Found files: {files}")  # Debug log
@@ -200,4 +304,8 @@ def getaudio():
 
 if __name__ == "__main__":
     print("Starting Flask server on http://localhost:5000")  # Debug log
+    # Load the image engines while the server starts instead of on the first
+    # request; with the debug reloader only the serving child needs them
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        warm(background=True)
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,84 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+SESSION_TTL = 3600
+MAX_SESSIONS = 32
+MAX_SESSION_BYTES = 256 * 1024 * 1024
+HASH_BLOCK_BYTES = 1 << 20
+
+def file_hash(path):
+    """SHA-256 of a file's bytes, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(HASH_BLOCK_BYTES), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _size(value):
+    # Rough footprint of an entry: the characters it holds plus a flat cost
+    # per container item, which is what grows with the document
+    if isinstance(value, str):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(_size(k) + _size(v) for k, v in value.items()) + 16 * len(value)
+    if isinstance(value, (list, tuple)):
+        return sum(_size(v) for v in value) + 8 * len(value)
+    return 8
+
+class SessionStore:
+    """
+    Thread-safe LRU store of per-document state, keyed by content hash.
+
+    Entries expire `ttl` seconds after their last use, and the least recently
+    used ones are dropped once there are more than `max_entries` or their
+    estimated size passes `max_bytes`.
+    """
+
+    def __init__(self, ttl=SESSION_TTL, max_entries=MAX_SESSIONS, max_bytes=MAX_SESSION_BYTES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+
+    def _drop(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def _expire(self, now):
+        for key in [key for key, (_, _, used) in self._entries.items() if now - used > self.ttl]:
+            self._drop(key)
+
+    def get(self, key):
+        """Return the entry for key, or None if it is missing or expired."""
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            if key not in self._entries:
+                return None
+            entry, size, _ = self._entries[key]
+            self._entries[key] = (entry, size, now)
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        """Store entry under key, evicting old entries to stay within the limits."""
+        size = _size(entry)
+        with self._lock:
+            now = time.monotonic()
+            if key in self._entries:
+                self._drop(key)
+            self._expire(now)
+            self._entries[key] = (entry, size, now)
+            self._bytes += size
+            while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                evicted = next(iter(self._entries))
+                self._drop(evicted)
+                print(f"Evicted session {evicted[:12]}")
+
+    def stats(self):
+        with self._lock:
+            return {'sessions': len(self._entries), 'bytes': self._bytes}